@@ -1,31 +1,66 @@
-import json, os, random, re, socket, sys, threading, time, math
-import win32.lib.win32con as win32con
-import usb.core
-from usb.backend import libusb1
+import asyncio, collections, json, random, sys, threading, time
+from concurrent.futures import Future
+from framing import JsonFramer
+from latency import percentile, recorder
+from status import CONNECTED, CONNECTING, STOPPED, StatusPublisher
+from shotmessage import ShotMessage, encode_shot
+
+
+PLAYER_INFO_CODE = 201
+HEARTBEAT = 'heartbeat'
 
 
 class OpenAPI:
 
-    def __init__(self, server_ip=None, buffer_size=1024):
+    def __init__(self, server_ip=None, buffer_size=1024, server_port=None, loop=None, heartbeat_interval=2.0, liveness_timeout=5.0, max_shot_age=10.0):
         self.stay_connected = True
         self.s = None
+        self.writer = None
         self.server_ip = server_ip
+        self.server_port = server_port
+        self.heartbeat_interval = heartbeat_interval
+        self.liveness_timeout = liveness_timeout
+        self.max_shot_age = max_shot_age
+        self.outbound = collections.deque()
+        self.outbound_ready = None
+        self.outbound_max_depth = 0
+        self.outbound_sent = 0
+        self.outbound_expired = 0
+        self.outbound_waits = collections.deque(maxlen=1000)
+        self.heartbeat_acknowledged = False
+        self.heartbeat_ignored = False
+        self.heartbeat_in_flight = False
+        self.awaiting_replies = collections.deque()
+        self.launch_monitor_ready = lambda: False
+        self.echo_shots = True
         self.buffer_size = buffer_size
         self.received_data = None
         self.last_received_data_time = None
         self.ball_launch_counter = 1
-        self.config = {}
-        self.read_config_file()
-        if self.server_ip is None:
-            self.server_ip = self.config.get('ip_address', 'localhost')
+        self._counter_lock = threading.Lock()
+        if self.server_ip is None or self.server_port is None:
+            from state import default_store
+            state = default_store()
+            if self.server_ip is None:
+                self.server_ip = state.get('gspro_ip')
+            if self.server_port is None:
+                self.server_port = state.get('gspro_port')
         self._club = 'DR'
         self._distance_to_flag = 0.0
         self._hand = 'right'
-        self.recv_thread = threading.Thread(target=(self.recv_data_thread), daemon=True).start()
+        self.send_lock = None
+        self.status = StatusPublisher('openapi')
+        if loop is None:
+            self.loop = asyncio.new_event_loop()
+            self.recv_thread = threading.Thread(target=(self.recv_data_thread), daemon=True)
+            self.recv_thread.start()
+        else:
+            self.loop = loop
+            self.recv_thread = None
+            asyncio.run_coroutine_threadsafe(self.connection_task(), loop)
 
     def __del__(self):
-        if self.s:
-            self.s.close()
+        self.disconnect()
 
     def is_connected(self):
         if self.s is None:
@@ -34,8 +69,28 @@ class OpenAPI:
             return False
         return True
 
+    def connection_state(self):
+        if self.is_connected():
+            return CONNECTED
+        if self.stay_connected:
+            return CONNECTING
+        return STOPPED
+
+    def publish_state(self):
+        self.status.publish(self.connection_state())
+
     def disconnect(self):
         self.stay_connected = False
+        self.publish_state()
+        if not self.loop.is_closed():
+            try:
+                self.loop.call_soon_threadsafe(self.close_writer)
+            except RuntimeError:
+                pass
+
+    def close_writer(self):
+        if self.writer:
+            self.writer.close()
 
     @property
     def club(self):
@@ -49,97 +104,239 @@ class OpenAPI:
     def hand(self):
         return self._hand
 
-    def read_config_file(self):
-        default_config = '[Config]\nIP=localhost'
-        config_file_name = 'Config.txt'
-        if os.path.isfile(config_file_name):
-            with open(config_file_name, 'r', encoding="utf8", errors='ignore') as (config_file):
-                for line in config_file:
-                    if 'IP' in line:
-                        self.config['ip_address'] = line[3:].rstrip()
-
-        else:
-            with open(config_file_name, 'w', encoding="utf8", errors='ignore') as (config_file):
-                config_file.write(default_config)
-
     def print_game_info(self):
         print('Club: ' + self.club)
         print('Distance to Flag: ' + str(self.distance_to_flag))
         print('Hand: ' + self.hand)
 
     def parse_returned_data(self, ret_json):
-        self._club = ret_json['data'].get('club_small', 'DR')
-        self._distance_to_flag = float(ret_json['data'].get('distance_to_flag', 0.0))
-        self._hand = ret_json['data'].get('handed_player', 'right')
+        data = ret_json.get('data')
+        if not isinstance(data, dict):
+            return
+        self._club = data.get('club_small', 'DR')
+        self._distance_to_flag = float(data.get('distance_to_flag', 0.0))
+        self._hand = data.get('handed_player', 'right')
 
     def recv_data_thread(self):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self.connection_task())
+        finally:
+            self.loop.close()
+
+    async def connection_task(self):
+        self.send_lock = asyncio.Lock()
+        self.outbound_ready = asyncio.Event()
+        outbound = asyncio.ensure_future(self.outbound_task())
+        self.publish_state()
         while self.stay_connected:
             try:
-                self.s = socket.create_connection((self.server_ip, 921), timeout=1.0)
-                self.s.settimeout(2.0)
-                while self.stay_connected:
-                    try:
-                        if self.last_received_data_time is not None:
-                            if time.time() - self.last_received_data_time > 2.5:
-                                self.last_received_data_time = None
-                                break
-                        if self.s:
-                            data = self.s.recv(self.buffer_size)
-                            if data:
-                                data = data.decode('utf-8')
-                                for d in data.splitlines():
-                                    self.received_data = json.loads(d)
-                                    self.parse_returned_data(self.received_data)
-                                    self.last_received_data_time = time.time()
-
-                    except json.decoder.JSONDecodeError:
-                        print('Could not decode returned data')
-                        print(str(data))
-                    except (BlockingIOError, ConnectionAbortedError):
-                        break
-
-            except (socket.timeout, TimeoutError):
+                reader, writer = await asyncio.wait_for(asyncio.open_connection(self.server_ip, self.server_port), timeout=1.0)
+            except (OSError, asyncio.TimeoutError):
                 print("Can't connect to OpenAPI")
+                await asyncio.sleep(1.0)
+                continue
+
+            self.writer = writer
+            self.s = writer.get_extra_info('socket')
+            self.awaiting_replies.clear()
+            self.heartbeat_acknowledged = False
+            self.heartbeat_ignored = False
+            self.heartbeat_in_flight = False
+            self.outbound_ready.set()
+            heartbeat = asyncio.ensure_future(self.heartbeat_task(writer))
+            try:
+                await self.read_messages(reader)
+            except (OSError, asyncio.IncompleteReadError):
+                pass
+            finally:
+                heartbeat.cancel()
+                self.s = None
+                self.writer = None
+                unanswered = [entry for entry in self.awaiting_replies if entry is not HEARTBEAT]
+                self.awaiting_replies.clear()
+                self.outbound.extendleft(reversed(unanswered))
+                self.last_received_data_time = None
+                writer.close()
+                self.publish_state()
+            print('Disconnected from OpenAPI')
+
+        self.outbound_ready.set()
+        await outbound
+
+    async def read_messages(self, reader):
+        framer = JsonFramer()
+        while self.stay_connected:
+            data = await reader.read(self.buffer_size)
+            if not data:
+                return
+            for message in framer.feed(data):
+                try:
+                    self.received_data = json.loads(message)
+                except json.decoder.JSONDecodeError:
+                    print('Could not decode returned data')
+                    print(message)
+                    continue
+
+                if isinstance(self.received_data, dict):
+                    self.parse_returned_data(self.received_data)
+                    code = self.received_data.get('Code')
+                    if code != PLAYER_INFO_CODE and self.awaiting_replies:
+                        self.reply_received(self.awaiting_replies.popleft(), code)
+                self.last_received_data_time = time.time()
+                self.publish_state()
+
+    def reply_received(self, entry, code):
+        if entry is HEARTBEAT:
+            self.heartbeat_acknowledged = True
+            self.heartbeat_in_flight = False
+            self.outbound_ready.set()
+            return
+        future = entry[3]
+        if isinstance(code, int) and 200 <= code < 300:
+            self.outbound_sent += 1
+            self.outbound_waits.append(time.monotonic() - entry[2])
+            future.set_result(True)
+        else:
+            print('GSPro rejected shot: ' + str(self.received_data.get('Message')))
+            future.set_result(False)
 
-            self.s = None
+    async def heartbeat_task(self, writer):
+        while self.stay_connected and self.writer is writer:
+            if self.heartbeat_acknowledged and time.time() - (self.last_received_data_time or 0.0) > self.liveness_timeout:
+                print('OpenAPI heartbeat timed out')
+                writer.close()
+                return
+            if self.heartbeat_in_flight and not self.heartbeat_acknowledged:
+                self.heartbeat_ignored = True
+                self.heartbeat_in_flight = False
+                self.awaiting_replies.remove(HEARTBEAT)
+                self.outbound_ready.set()
+            if not self.heartbeat_in_flight:
+                try:
+                    ready = bool(self.launch_monitor_ready())
+                except Exception:
+                    ready = False
+                try:
+                    await self.send_payload(encode_shot(None, self.ball_launch_counter, ready=ready, ball_detected=False, heartbeat=True), HEARTBEAT)
+                except OSError:
+                    return
+            await asyncio.sleep(self.heartbeat_interval)
+
+    async def outbound_task(self):
+        while self.stay_connected:
+            try:
+                await asyncio.wait_for(self.outbound_ready.wait(), timeout=0.25)
+            except asyncio.TimeoutError:
+                pass
+            self.outbound_ready.clear()
+            await self.flush_outbound()
+
+        while self.outbound:
+            self.outbound.popleft()[3].set_result(False)
+
+    async def flush_outbound(self):
+        while self.outbound:
+            if self.heartbeat_in_flight and not self.heartbeat_acknowledged:
+                return
+            entry = self.outbound.popleft()
+            payload, received_at, queued_at, future = entry
+            age = time.monotonic() - received_at
+            if age > self.max_shot_age:
+                self.outbound_expired += 1
+                print('Dropping shot read %.1f s ago, GSPro was unreachable' % age)
+                future.set_result(False)
+                continue
+            try:
+                if not await self.send_payload(payload, entry):
+                    self.outbound.appendleft(entry)
+                    return
+            except OSError:
+                return
+
+    def queue_payload(self, payload, received_at=None):
+        future = Future()
+        if received_at is None:
+            received_at = time.monotonic()
+
+        def enqueue():
+            self.outbound.append((payload, received_at, time.monotonic(), future))
+            self.outbound_max_depth = max(self.outbound_max_depth, len(self.outbound))
+            self.outbound_ready.set()
+
+        self.loop.call_soon_threadsafe(enqueue)
+        return future
+
+    def outbound_stats(self):
+        waits = sorted(self.outbound_waits)
+        return {'depth': len(self.outbound), 'unanswered': sum(1 for entry in list(self.awaiting_replies) if entry is not HEARTBEAT), 'max_depth': self.outbound_max_depth, 'sent': self.outbound_sent, 'expired': self.outbound_expired,
+                'wait_p50_ms': percentile(waits, 50) * 1000.0, 'wait_p95_ms': percentile(waits, 95) * 1000.0, 'wait_max_ms': waits[-1] * 1000.0 if waits else 0.0}
+
+    def report(self):
+        return 'openapi outbound: depth %(depth)d (max %(max_depth)d), awaiting reply %(unanswered)d, sent %(sent)d, expired %(expired)d, queue wait p50 %(wait_p50_ms).1f ms p95 %(wait_p95_ms).1f ms max %(wait_max_ms).1f ms' % self.outbound_stats()
+
+    async def send_payload(self, payload, entry):
+        writer = self.writer
+        if writer is None:
+            return False
+        async with self.send_lock:
+            if entry is not HEARTBEAT or not self.heartbeat_ignored:
+                self.heartbeat_in_flight |= entry is HEARTBEAT
+                self.awaiting_replies.append(entry)
+            writer.write(payload)
+            await writer.drain()
+        return True
 
     def get_game_status(self):
         return self.received_data
 
-    def launch_ball(self, ballspeed, ballpath, launchangle, backspin, sidespin, clubspeed=None, clubface=None, clubpath=None, sweetspot=None, drag=None, carry=None):
+    def launch_ball(self, ballspeed, ballpath, launchangle, backspin, sidespin, clubspeed=None, clubface=None, clubpath=None, sweetspot=None, drag=None, carry=None, trace=None, done=None):
         try:
-            totalspin = math.sqrt(float(sidespin) ^ 2 + str(backspin) ^ 2)
-            spinaxis = math.atan(float(sidespin) / float(backspin)) * (180/math.pi)
-            shot_json = json.loads('{"DeviceID":"gc2","Apiversion":"1","Units":"Yards","BallData":{"Speed":"0.0","SpinAxis":"0.0","TotalSpin":"0.0","HLA":"0.0","VLA":"0.0"},"ShotDataOptions":{"ContainsBallData":"true","ContainsClubData":"false","LaunchMonitorIsReady":"true","LaunchMonitorBallDetected":"true","IsHeartBeat":"false"}}')
-            shot_json['BallData']['Speed'] = str(ballspeed)
-            shot_json['BallData']['HLA'] = str(ballpath)
-            shot_json['BallData']['VLA'] = str(launchangle)
-            shot_json['BallData']['TotalSpin'] = str(totalspin)
-            if self.hand == 'left':
-                shot_json['data']['SpinAxis'] = str(-1.0 * float(spinaxis))
-            else:
-                shot_json['data']['SpinAxis'] = str(spinaxis)
-            #if clubspeed:
-            #    shot_json['data']['clubspeed'] = str(clubspeed)
-            #if clubface:
-            #    shot_json['data']['clubface'] = str(clubface)
-            #if clubpath:
-            #    shot_json['data']['clubpath'] = str(clubpath)
-            #if sweetspot:
-            #    shot_json['data']['sweetspot'] = str(sweetspot)
-            #if drag is None:
-            #    drag = 1.0
-            #shot_json['data']['drag'] = str(drag)
-            #if carry:
-            #    shot_json['data']['carry'] = str(carry)
-            if self.s:
-                print(shot_json)
-                self.s.send(json.dumps(shot_json, separators=(',', ':')).encode('utf-8'))
-                return True
-        except OSError:
-            pass
-
-        return False
+            shot = ShotMessage.from_spin(ballspeed, ballpath, launchangle, backspin, sidespin, left_handed=(self.hand == 'left'))
+            if clubspeed is not None:
+                shot.club_speed = clubspeed
+            if clubpath is not None:
+                shot.path = clubpath
+                if clubface is not None:
+                    shot.face_to_target = clubface + shot.path
+            if sweetspot is not None:
+                shot.horizontal_face_impact = sweetspot
+            return self.send_shot(shot, trace=trace, done=done)
+        except (TypeError, ValueError):
+            print('Could not encode shot')
+
+    def launch_club(self, clubspeed, clubface=None, clubpath=None, sweetspot=None, shot_number=None, trace=None, received_at=None, done=None):
+        shot = ShotMessage(club_speed=clubspeed, path=clubpath, horizontal_face_impact=sweetspot)
+        if clubpath is not None:
+            if clubface is not None:
+                shot.face_to_target = clubface + clubpath
+        return self.send_shot(shot, trace=trace, shot_number=shot_number, received_at=received_at, done=done)
+
+    def send_shot(self, shot, trace=None, shot_number=None, received_at=None, done=None):
+        if shot_number is None:
+            with self._counter_lock:
+                shot_number = self.ball_launch_counter
+                self.ball_launch_counter += 1
+        payload = encode_shot(shot, shot_number)
+        if received_at is None and trace is not None:
+            received_at = trace.stamps[0][1]
+        try:
+            future = self.queue_payload(payload, received_at)
+        except RuntimeError:
+            return
+
+        def finished(future):
+            sent = future.result()
+            if sent:
+                if trace is not None:
+                    recorder.record(trace.mark('sent'))
+                if self.echo_shots:
+                    print(payload.decode('utf-8'))
+            if done is not None:
+                done(sent)
+
+        future.add_done_callback(finished)
+        return shot_number
 
 
 if __name__ == '__main__':
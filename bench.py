@@ -0,0 +1,267 @@
+import json, math, os, subprocess, sys, time, timeit, tracemalloc
+from array import array
+from shotmessage import ShotMessage, encode_shot
+
+
+GC2_SAMPLE_LINES = [
+    'CT=1259299,SN=2638,HW=3,SW=4.0.0,ID=2,TM=1259299,SP=4.32,AZ=-0.55,EL=12.80,TS=3514,SS=-285,BS=3502,CY=0.00,TL=0.00,SM=0.00,HMT=0',
+    'CT=1262302,SN=2638,HW=3,SW=4.0.0,ID=3,TM=1262302,SP=142.71,AZ=2.14,EL=11.36,TS=2687,SS=-312,BS=2669,CY=251.40,TL=272.10,SM=0.00,HMT=1,CS=101.20,HP=3.10,VP=-1.20,FC=1.40,LI=0.50,LF=14.20,HI=-4.00,VI=2.00,FA=0.00,CR=0.00',
+    'CT=1265001,SN=2638,HW=3,SW=4.0.0,ID=3,TM=1262302,SP=0.00,AZ=0.00,EL=0.00,TS=0,SS=0,BS=0,CY=0.00,TL=0.00,SM=0.00,HMT=0',
+]
+
+GC2USB_SAMPLE_BLOCKS = [
+    'SHOT_ID=12\nMSEC_SINCE_CONTACT=1003\nSPEED_MPH=142.71\nAZIMUTH_DEG=2.14\nELEVATION_DEG=11.36\nSPIN_RPM=2687\nBACK_RPM=2669\nSIDE_RPM=-312\nHMT=0\n',
+    'SHOT_ID=12\nMSEC_SINCE_CONTACT=1803\nSPEED_MPH=142.71\nAZIMUTH_DEG=2.14\nELEVATION_DEG=11.36\nSPIN_RPM=2687\nBACK_RPM=2669\nSIDE_RPM=-312\nHMT=1\nCLUBSPEED_MPH=101.20\nHPATH_DEG=3.10\nVPATH_DEG=-1.20\nFACE_T_DEG=1.40\nLIE_DEG=0.50\nLOFT_DEG=14.20\nHIMPACT_MM=-4.00\nVIMPACT_MM=2.00\nFAXIS_DEG=0.00\nCLOSING_RATE_DEGSEC=0.00\n',
+    'SHOT_ID=13\nMSEC_SINCE_CONTACT=1001\nSPEED_MPH=31.02\nAZIMUTH_DEG=-0.40\nELEVATION_DEG=2.10\nSPIN_RPM=3500\nBACK_RPM=3500\nSIDE_RPM=0\nHMT=0\n',
+]
+
+LEGACY_GC2USB_IDENTIFIERS = {
+    'current_time': 'MSEC_SINCE_CONTACT',
+    'ID': 'SHOT_ID',
+    'ball_speed': 'SPEED_MPH',
+    'horizontal_launch_angle': 'AZIMUTH_DEG',
+    'launch_angle': 'ELEVATION_DEG',
+    'total_spin': 'SPIN_RPM',
+    'side_spin': 'SIDE_RPM',
+    'back_spin': 'BACK_RPM',
+    'hmt': 'HMT',
+    'club_speed': 'CLUBSPEED_MPH',
+    'swing_path': 'HPATH_DEG',
+    'angle_of_attack': 'VPATH_DEG',
+    'face_to_target': 'FACE_T_DEG',
+    'lie': 'LIE_DEG',
+    'dynamic_loft': 'LOFT_DEG',
+    'horizontal_impact_location': 'HIMPACT_MM',
+    'veritcal_impact_location': 'VIMPACT_MM',
+    'f_axis': 'FAXIS_DEG',
+    'closure_rate': 'CLOSING_RATE_DEGSEC',
+}
+
+
+def legacy_parse_gc2_string(line):
+    identifier_dict = {}
+    identifier_dict['current_time'] = 'CT'
+    identifier_dict['serial_number'] = 'SN'
+    identifier_dict['hardware_version'] = 'HW'
+    identifier_dict['software_version'] = 'SW'
+    identifier_dict['ID'] = 'ID'
+    identifier_dict['shot_time'] = 'TM'
+    identifier_dict['ball_speed'] = 'SP'
+    identifier_dict['horizontal_launch_angle'] = 'AZ'
+    identifier_dict['launch_angle'] = 'EL'
+    identifier_dict['total_spin'] = 'TS'
+    identifier_dict['side_spin'] = 'SS'
+    identifier_dict['back_spin'] = 'BS'
+    identifier_dict['carry'] = 'CY'
+    identifier_dict['total'] = 'TL'
+    identifier_dict['hmt'] = 'HMT'
+    identifier_dict['club_speed'] = 'CS'
+    identifier_dict['swing_path'] = 'HP'
+    identifier_dict['angle_of_attack'] = 'VP'
+    identifier_dict['face_to_target'] = 'FC'
+    identifier_dict['lie'] = 'LI'
+    identifier_dict['dynamic_loft'] = 'LF'
+    identifier_dict['horizontal_impact_location'] = 'HI'
+    identifier_dict['veritcal_impact_location'] = 'VI'
+    identifier_dict['f_axis'] = 'FA'
+    identifier_dict['closure_rate'] = 'CR'
+    output_dict = {}
+    for key, identifier in identifier_dict.items():
+        try:
+            output_dict[key] = line.split(identifier + '=', 1)[1].split(',', 1)[0]
+        except IndexError:
+            pass
+
+    return output_dict
+
+
+def legacy_parse_gc2_usb_text(block):
+    output_dict = {}
+    for key, identifier in dict(LEGACY_GC2USB_IDENTIFIERS).items():
+        try:
+            output_dict[key] = block.split(identifier + '=', 1)[1].split('\n', 1)[0].strip()
+        except IndexError:
+            pass
+
+    if int(output_dict.get('back_spin', -1)) == 3500:
+        if int(output_dict.get('side_spin', -1)) == 0:
+            output_dict['ball_speed'] = 0.0
+    return output_dict
+
+
+def rate(func, samples, number=20000):
+    elapsed = timeit.timeit(lambda: [func(s) for s in samples], number=number)
+    return number * len(samples) / elapsed
+
+
+def report(name, before, after):
+    print('%-24s before: %10.0f/s  after: %10.0f/s  (x%.1f)' % (name, before, after, after / before))
+
+
+def retained_per_shot(func, samples, shots=3000):
+    tracemalloc.start()
+    kept = [func(samples[i % len(samples)]) for i in range(shots)]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return size / shots
+
+
+def bench_gc2_parse():
+    from gc2 import GC2
+    report('gc2 lines', rate(legacy_parse_gc2_string, GC2_SAMPLE_LINES), rate(GC2.parse_gc2_string, GC2_SAMPLE_LINES))
+    print('%-24s before: %10.0f B   after: %10.0f B' % ('gc2 retained per shot', retained_per_shot(legacy_parse_gc2_string, GC2_SAMPLE_LINES[:2]), retained_per_shot(GC2.parse_gc2_string, GC2_SAMPLE_LINES[:2])))
+
+
+def bench_gc2usb_parse():
+    from gc2USB import GC2USB
+    report('usb blocks', rate(legacy_parse_gc2_usb_text, GC2USB_SAMPLE_BLOCKS), rate(GC2USB.parse_gc2_usb_text, GC2USB_SAMPLE_BLOCKS))
+
+
+def peak_allocation(func, sample):
+    tracemalloc.start()
+    func(sample)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def bench_usb_read_decode():
+    payload = GC2USB_SAMPLE_BLOCKS[1].encode('latin-1')
+    read_buffer = array('B', bytes(10000))
+    read_buffer[:len(payload)] = array('B', payload)
+    read_view = memoryview(read_buffer)
+    count = len(payload)
+    ret = array('B', payload)
+
+    def legacy_decode(ret):
+        return ''.join([chr(x) for x in ret])
+
+    def view_decode(count):
+        return str(read_view[:count], 'latin-1')
+
+    report('usb read decode', rate(legacy_decode, [ret]), rate(view_decode, [count]))
+    print('%-24s before: %10d B   after: %10d B' % ('usb read peak alloc', peak_allocation(legacy_decode, ret), peak_allocation(view_decode, count)))
+
+
+def legacy_encode_shot(ballspeed, ballpath, launchangle, backspin, sidespin):
+    totalspin = math.sqrt(float(sidespin) ** 2 + float(backspin) ** 2)
+    spinaxis = math.atan(float(sidespin) / float(backspin)) * (180 / math.pi)
+    shot_json = json.loads('{"DeviceID":"gc2","Apiversion":"1","Units":"Yards","BallData":{"Speed":"0.0","SpinAxis":"0.0","TotalSpin":"0.0","HLA":"0.0","VLA":"0.0"},"ShotDataOptions":{"ContainsBallData":"true","ContainsClubData":"false","LaunchMonitorIsReady":"true","LaunchMonitorBallDetected":"true","IsHeartBeat":"false"}}')
+    shot_json['BallData']['Speed'] = str(ballspeed)
+    shot_json['BallData']['HLA'] = str(ballpath)
+    shot_json['BallData']['VLA'] = str(launchangle)
+    shot_json['BallData']['TotalSpin'] = str(totalspin)
+    shot_json['BallData']['SpinAxis'] = str(spinaxis)
+    return json.dumps(shot_json, separators=(',', ':')).encode('utf-8')
+
+
+def bench_shot_encode():
+    ball = (142.71, 2.14, 11.36, 2669.0, -312.0)
+
+    def legacy(args):
+        return legacy_encode_shot(*args)
+
+    def prebuilt(args):
+        return encode_shot(ShotMessage.from_spin(*args), 1)
+
+    def prebuilt_with_club(args):
+        return encode_shot(ShotMessage.from_spin(*args, club_speed=101.2, path=3.1, face_to_target=1.4), 1)
+
+    before = rate(legacy, [ball])
+    report('shot encode', before, rate(prebuilt, [ball]))
+    report('shot encode with club', before, rate(prebuilt_with_club, [ball]))
+    print('%-24s %.2f us/shot' % ('encode per shot', 1e6 / rate(prebuilt_with_club, [ball])))
+
+
+def bench_openapi_send(shots=500):
+    from gspro_standin import StandInServer
+    from latency import percentile
+    from OpenAPI import OpenAPI
+    server = StandInServer(port=0, seed=1)
+    gspro = OpenAPI(server_ip='127.0.0.1', server_port=server.start())
+    while not gspro.is_connected():
+        time.sleep(0.01)
+    gspro.echo_shots = False
+    send_times = []
+    started = time.perf_counter()
+    for _ in range(shots):
+        start = time.perf_counter()
+        gspro.send_shot(ShotMessage.from_spin(142.71, 2.14, 11.36, 2669.0, -312.0), done=lambda sent, start=start: send_times.append(time.perf_counter() - start))
+
+    while len(send_times) < shots:
+        time.sleep(0.001)
+    elapsed = time.perf_counter() - started
+    deadline = time.monotonic() + 2.0
+    while len(server.received) <= shots and time.monotonic() < deadline:
+        time.sleep(0.01)
+    gspro.disconnect()
+    server.stop()
+    send_times.sort()
+    print('%-24s %8d shots  %10.0f shots/s  p50 %.3f ms  p99 %.3f ms' % ('openapi send', len(server.received), shots / elapsed, percentile(send_times, 50) * 1000.0, percentile(send_times, 99) * 1000.0))
+
+
+def bench_import_time(modules=('OpenAPI', 'gc2', 'gc2USB', 'daemon'), runs=5):
+    here = os.path.dirname(os.path.realpath(__file__))
+    for module in modules:
+        script = 'import time; start = time.perf_counter(); import %s; print(time.perf_counter() - start)' % module
+        times = []
+        for _ in range(runs):
+            try:
+                output = subprocess.check_output([sys.executable, '-c', script], cwd=here, stderr=subprocess.DEVNULL)
+            except subprocess.CalledProcessError:
+                break
+            times.append(float(output))
+
+        if times:
+            print('%-24s %8.2f ms (best of %d)' % ('import ' + module, min(times) * 1000.0, len(times)))
+        else:
+            print('%-24s failed' % ('import ' + module))
+
+
+def bench_shotlog_scan(shots=200000):
+    import tempfile
+    from gc2 import GC2
+    from shotlog import DELIVERED, HEADER, ShotLogReader, pack_shot
+    shot = GC2.parse_gc2_string(GC2_SAMPLE_LINES[1])
+    shot.raw = GC2_SAMPLE_LINES[1]
+    record = pack_shot(shot, DELIVERED)
+    with tempfile.TemporaryDirectory() as directory:
+        file_name = os.path.join(directory, 'bench.gc2log')
+        with open(file_name, 'wb') as (log_file):
+            log_file.write(HEADER + record * shots)
+        start = time.perf_counter()
+        with ShotLogReader(file_name) as reader:
+            records = reader.records()
+            mean_speed = float(records['ball_speed'].mean())
+            del records
+        elapsed = time.perf_counter() - start
+    print('%-24s %8d shots in %.3f s (%.0f shots/s, mean speed %.1f)' % ('shot log scan', shots, elapsed, shots / elapsed, mean_speed))
+
+
+def bench_filter_check():
+    from filters import FilterEngine
+    from gc2 import GC2
+    from gc2USB import GC2USB
+    filters = FilterEngine.default()
+    shots = [GC2.parse_gc2_string(line) for line in GC2_SAMPLE_LINES] + [GC2USB.parse_gc2_usb_text(block) for block in GC2USB_SAMPLE_BLOCKS]
+    outliers = ', '.join(filters.outliers.fields) if filters.outliers is not None else 'off'
+    print('%-24s %10.0f/s  (%d rules, outliers %s)' % ('filter check', rate(lambda shot: filters.check(shot, 'DR'), shots), len(filters.rules), outliers))
+
+
+BENCHMARKS = {
+    'gc2_parse': bench_gc2_parse,
+    'gc2usb_parse': bench_gc2usb_parse,
+    'usb_read_decode': bench_usb_read_decode,
+    'shot_encode': bench_shot_encode,
+    'openapi_send': bench_openapi_send,
+    'import_time': bench_import_time,
+    'shotlog_scan': bench_shotlog_scan,
+    'filter_check': bench_filter_check,
+}
+
+
+if __name__ == '__main__':
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        BENCHMARKS[name]()
@@ -0,0 +1,45 @@
+import time
+
+
+GC2_NAME_PREFIX = 'Foresight_GC2'
+
+
+def serial_from_name(bt_name):
+    return bt_name[len(GC2_NAME_PREFIX):].strip(' _-') if bt_name.startswith(GC2_NAME_PREFIX) else None
+
+
+class DiscoveryCache:
+
+    def __init__(self, store=None, ttl=86400.0):
+        self._store = store
+        self.ttl = ttl
+
+    @property
+    def store(self):
+        if self._store is None:
+            from state import default_store
+            self._store = default_store()
+        return self._store
+
+    def lookup(self, serial_number, now=None):
+        if not serial_number:
+            return None
+        if now is None:
+            now = time.time()
+        device = self.store.device(serial_number)
+        if device is None or not device.address or now - device.last_seen > self.ttl:
+            return None
+        return device.address
+
+    def update(self, serial_number, address, now=None):
+        if serial_number and address:
+            self.store.device_seen(serial_number, address, now)
+
+    def update_from_scan(self, devices, now=None):
+        for bt_addr, bt_name in devices:
+            serial = serial_from_name(bt_name)
+            if serial:
+                self.store.device_seen(serial, bt_addr, now)
+
+    def entries(self):
+        return {serial: (device.address, device.last_seen) for serial, device in self.store.known_devices().items() if device.last_seen}
@@ -0,0 +1,155 @@
+import argparse, os, struct, threading, time
+
+
+CAPTURE_MAGIC = b'GC2CAP1\n'
+RECORD_HEADER = struct.Struct('<dI')
+TRANSPORTS = ('bluetooth', 'usb')
+
+
+def capture_file_name(directory, transport):
+    return os.path.join(directory, '%s-%s.gc2cap' % (transport, time.strftime('%Y%m%d-%H%M%S')))
+
+
+class CaptureWriter:
+
+    def __init__(self, file_name, transport):
+        self.file_name = file_name
+        self.transport = transport
+        self._lock = threading.Lock()
+        self._start = time.monotonic()
+        self._file = open(file_name, 'wb')
+        self._file.write(CAPTURE_MAGIC + bytes((TRANSPORTS.index(transport),)))
+
+    def write(self, data, received_at=None):
+        if received_at is None:
+            received_at = time.monotonic()
+        with self._lock:
+            if self._file is not None:
+                self._file.write(RECORD_HEADER.pack(received_at - self._start, len(data)))
+                self._file.write(data)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def read_capture(file_name):
+    with open(file_name, 'rb') as (capture_file):
+        data = capture_file.read()
+    if not data.startswith(CAPTURE_MAGIC):
+        raise ValueError('Not a GC2 capture: ' + file_name)
+    transport = TRANSPORTS[data[len(CAPTURE_MAGIC)]]
+    records = []
+    offset = len(CAPTURE_MAGIC) + 1
+    while offset + RECORD_HEADER.size <= len(data):
+        timestamp, length = RECORD_HEADER.unpack_from(data, offset)
+        offset += RECORD_HEADER.size
+        records.append((timestamp, data[offset:offset + length]))
+        offset += length
+
+    return transport, records
+
+
+class ReplaySource:
+
+    def __init__(self, records, realtime=True, on_finished=None):
+        self.records = records
+        self.realtime = realtime
+        self.on_finished = on_finished
+        self.index = 0
+        self.bytes_replayed = 0
+        self._start = None
+
+    def next_chunk(self, size):
+        if self.index >= len(self.records):
+            if self.on_finished:
+                self.on_finished()
+            return b''
+        timestamp, data = self.records[self.index]
+        if self._start is None:
+            self._start = time.monotonic() - timestamp
+        if self.realtime:
+            delay = self._start + timestamp - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        if len(data) > size:
+            self.records[self.index] = (timestamp, data[size:])
+            data = data[:size]
+        else:
+            self.index += 1
+        self.bytes_replayed += len(data)
+        return data
+
+
+class ReplaySocket:
+
+    def __init__(self, source):
+        self.source = source
+
+    def connect(self, address):
+        pass
+
+    def settimeout(self, timeout):
+        pass
+
+    def recv(self, size):
+        return self.source.next_chunk(size)
+
+    def close(self):
+        pass
+
+
+class ReplayDevice:
+
+    def __init__(self, source):
+        self.source = source
+
+    def set_configuration(self):
+        pass
+
+    def get_active_configuration(self):
+        return {(0, 0): None}
+
+    def read(self, endpoint, buffer, timeout):
+        data = self.source.next_chunk(len(buffer))
+        memoryview(buffer)[:len(data)] = data
+        return len(data)
+
+
+def replay(file_name, realtime=True, callback=None):
+    transport, records = read_capture(file_name)
+    if transport == 'bluetooth':
+        from gc2 import GC2
+        device = GC2()
+        source = ReplaySource(records, realtime, on_finished=device.disconnect)
+        device.socket_factory = lambda protocol: ReplaySocket(source)
+        connect_args = {'bt_addr': 'replay'}
+    else:
+        from gc2USB import GC2USB
+        device = GC2USB()
+        source = ReplaySource(records, realtime, on_finished=device.disconnect)
+        device.device_factory = lambda: ReplayDevice(source)
+        connect_args = {}
+    device.wait_for_hmt = False
+    shots = []
+
+    def cb(shot):
+        shots.append(shot)
+        if callback:
+            callback(shot)
+
+    start = time.perf_counter()
+    device.connect(cb, **connect_args)
+    return transport, shots, source.bytes_replayed, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Replay a raw GC2 capture through the device receive loop')
+    parser.add_argument('capture')
+    parser.add_argument('--max-speed', action='store_true', help='ignore capture timestamps and replay as fast as possible')
+    parser.add_argument('--quiet', action='store_true')
+    args = parser.parse_args()
+    transport, shots, replayed, elapsed = replay(args.capture, realtime=(not args.max_speed), callback=(None if args.quiet else print))
+    print('%s: %d shots, %d bytes in %.3f s (%.0f bytes/s)' % (transport, len(shots), replayed, elapsed, replayed / elapsed if elapsed else 0.0))
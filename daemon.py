@@ -0,0 +1,115 @@
+import argparse, signal, sys, threading, time
+from delivery import deliver_shot
+from filters import FilterEngine
+from sinks import ShotFanOut
+from endpoint import parse_endpoint
+from pipeline import ShotPipeline
+from shotlog import DELIVERED, FAILED, REJECTED, ShotLog
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Run one GC2 to GSPro OpenAPI link without the GUI')
+    parser.add_argument('--transport', choices=('bluetooth', 'usb'), default='bluetooth')
+    parser.add_argument('--serial', default=None, help='GC2 serial number (Bluetooth)')
+    parser.add_argument('--address', default=None, help='GC2 Bluetooth address, skips discovery')
+    parser.add_argument('--usb-location', default=None, help='USB bus and port path, e.g. 1-2.3')
+    parser.add_argument('--gspro', default=None, help='GSPro OpenAPI host[:port], defaults to the address in State.txt')
+    parser.add_argument('--max-shot-age', type=float, default=10.0, help='seconds a shot may wait for GSPro to reconnect before it is dropped')
+    parser.add_argument('--wait-for-hmt', action='store_true')
+    parser.add_argument('--split-delivery', action='store_true', help='send ball data at once and club data when the HMT line arrives')
+    parser.add_argument('--club-timeout', type=float, default=5.0, help='seconds to wait for club data in split delivery')
+    parser.add_argument('--capture-dir', default=None, help='record raw device data to this directory')
+    parser.add_argument('--shot-log-dir', default='shotlogs', help='directory for the binary shot log')
+    parser.add_argument('--sinks', default='Sinks.txt', help='extra shot consumers, written with disabled examples if missing')
+    parser.add_argument('--filters', default='Filters.txt', help='misread filter rules, written with the defaults if missing')
+    parser.add_argument('--refresh-interval', type=float, default=0.0, help='seconds between background Bluetooth discovery refreshes, 0 to disable')
+    parser.add_argument('--report-interval', type=float, default=0.0, help='seconds between latency reports, 0 to disable')
+    args = parser.parse_args(argv)
+    if args.transport == 'bluetooth' and not (args.serial or args.address):
+        parser.error('--serial or --address is required for Bluetooth')
+    return args
+
+
+def create_device(args):
+    if args.transport == 'usb':
+        from gc2USB import GC2USB
+        device = GC2USB()
+        device.usb_location = args.usb_location
+    else:
+        from gc2 import GC2
+        device = GC2()
+        if args.refresh_interval:
+            device.start_background_refresh(args.refresh_interval)
+    device.wait_for_hmt = args.wait_for_hmt
+    device.split_delivery = args.split_delivery
+    device.club_timeout = args.club_timeout
+    device.capture_dir = args.capture_dir
+    return device
+
+
+def create_gspro(args):
+    from OpenAPI import OpenAPI
+    if args.gspro is None:
+        return OpenAPI(max_shot_age=args.max_shot_age)
+    host, port = parse_endpoint(args.gspro)
+    return OpenAPI(server_ip=host, server_port=port, max_shot_age=args.max_shot_age)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    gspro = create_gspro(args)
+    device = create_device(args)
+    gspro.launch_monitor_ready = device.is_connected
+    shot_pipeline = ShotPipeline(name='gspro')
+    shot_filters = FilterEngine.from_config(args.filters)
+    shot_sinks = ShotFanOut().load_config(args.sinks)
+    shot_log = ShotLog(directory=args.shot_log_dir, prefix='daemon')
+
+    def enqueue(l):
+        shot_pipeline.submit(l, deliver)
+        shot_sinks.publish(l)
+
+    def deliver(l):
+        queued = deliver_shot(gspro, l, shot_filters, shot_sent)
+        if queued is None:
+            shot_log.append(l, REJECTED)
+        elif not queued:
+            shot_log.append(l, FAILED)
+
+    def shot_sent(l, sent):
+        shot_log.append(l, DELIVERED if sent else FAILED)
+
+    def stop(*_):
+        device.disconnect()
+        gspro.disconnect()
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    if args.transport == 'usb':
+        connect_args = {}
+    else:
+        connect_args = {'serial_number': args.serial, 'bt_addr': args.address}
+    device_thread = threading.Thread(target=(device.connect), args=(enqueue,), kwargs=connect_args, daemon=True)
+    device_thread.start()
+    last_report = time.monotonic()
+    while device_thread.is_alive():
+        device_thread.join(0.5)
+        if args.report_interval and time.monotonic() - last_report >= args.report_interval:
+            from latency import recorder
+            print(recorder.dump())
+            print(shot_pipeline.report())
+            print(gspro.report())
+            print(shot_filters.report())
+            print(shot_sinks.report())
+            print(device.reconnect.report())
+            last_report = time.monotonic()
+
+    gspro.disconnect()
+    shot_pipeline.stop()
+    shot_sinks.stop()
+    shot_log.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
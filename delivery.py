@@ -0,0 +1,46 @@
+from functools import partial
+from shot import CLUB
+
+
+def club_angles(l):
+    clubpath = None
+    if l.swing_path is not None:
+        clubpath = -l.swing_path
+    face_to_path = None
+    if l.face_to_target is not None:
+        if clubpath is not None:
+            face_to_path = -l.face_to_target - clubpath
+    return clubpath, face_to_path
+
+
+def deliver_shot(gspro, l, filters, done=None):
+    if l.part == CLUB:
+        return deliver_club_data(gspro, l, done)
+    clubpath, face_to_path = club_angles(l)
+    rejected = filters.check(l, gspro.club)
+    if rejected:
+        print('Rejecting shot due to ' + rejected + ', assumed misread.')
+        return
+    if l.trace is not None:
+        l.trace.mark('filtered')
+    l.shot_number = gspro.launch_ball(l.ball_speed, l.horizontal_launch_angle, l.launch_angle, l.back_spin, l.side_spin, clubspeed=(l.club_speed),
+                                      clubface=face_to_path,
+                                      clubpath=clubpath,
+                                      sweetspot=(l.horizontal_impact_location),
+                                      trace=(l.trace),
+                                      done=(partial(done, l) if done else None))
+    return l.shot_number is not None
+
+
+def deliver_club_data(gspro, l, done=None):
+    if l.ball_shot is None or l.ball_shot.shot_number is None:
+        print('Not sending club data, the ball data for this shot was not delivered.')
+        return
+    clubpath, face_to_path = club_angles(l)
+    if l.trace is not None:
+        l.trace.mark('filtered')
+    received_at = l.ball_shot.trace.stamps[0][1] if l.ball_shot.trace is not None else None
+    l.shot_number = gspro.launch_club(l.club_speed, clubface=face_to_path, clubpath=clubpath, sweetspot=(l.horizontal_impact_location), shot_number=(l.ball_shot.shot_number), trace=(l.trace),
+                                      received_at=received_at,
+                                      done=(partial(done, l) if done else None))
+    return l.shot_number is not None
@@ -0,0 +1,5 @@
+def parse_endpoint(value, default_port=921):
+    host, _, port = value.strip().rpartition(':')
+    if not host:
+        return port or '127.0.0.1', default_port
+    return host, int(port)
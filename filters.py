@@ -0,0 +1,201 @@
+import collections, configparser, operator, os, statistics, threading
+
+
+DEFAULT_FILTER_CONFIG = '''[Rule zero_spin]
+When=back_spin == 0, side_spin == 0
+
+[Rule backspin_2222]
+When=back_spin == 2222
+
+[Rule usb_3500_spin]
+When=transport == usb, back_spin == 3500, side_spin == 0
+
+[Rule no_ball_speed]
+When=ball_speed <= 0.01
+
+[Rule missing_ball_speed]
+When=ball_speed == missing
+
+[Rule missing_spin]
+When=back_spin == missing
+
+[Rule no_launch_angle]
+When=launch_angle == missing
+
+[Rule implausible_ball_speed]
+When=ball_speed > 250
+
+[Rule implausible_spin]
+When=back_spin > 15000
+
+[Outliers]
+Enabled=false
+Fields=spin_per_mph
+Window=50
+MinShots=10
+MaxZScore=4.0
+'''
+
+OPERATORS = (('<=', operator.le), ('>=', operator.ge), ('==', operator.eq), ('!=', operator.ne), ('<', operator.lt), ('>', operator.gt))
+MISSING = object()
+MAD_TO_STD = 1.4826
+
+
+def shot_values(shot, fields):
+    values = {}
+    for name in fields:
+        value = getattr(shot, name, None)
+        values[name] = MISSING if value is None else value
+
+    if 'spin_per_mph' in fields:
+        back_spin, ball_speed = values.get('back_spin', MISSING), values.get('ball_speed', MISSING)
+        values['spin_per_mph'] = back_spin / ball_speed if back_spin is not MISSING and ball_speed not in (MISSING, 0.0) else MISSING
+    return values
+
+
+def compile_condition(text):
+    for symbol, op in OPERATORS:
+        field, sep, value = text.partition(symbol)
+        if sep:
+            break
+    else:
+        raise ValueError('No comparison in filter condition: ' + text)
+    field, value = field.strip(), value.strip().strip('\'"')
+    if value == 'missing':
+        if op not in (operator.eq, operator.ne):
+            raise ValueError('missing only supports == and !=: ' + text)
+        wanted = op is operator.eq
+        return field, lambda values: (values[field] is MISSING) == wanted
+    try:
+        value = float(value)
+    except ValueError:
+        if op not in (operator.eq, operator.ne):
+            raise ValueError('Text values only support == and !=: ' + text)
+    return field, lambda values: values[field] is not MISSING and op(values[field], value)
+
+
+class Rule:
+
+    def __init__(self, name, when):
+        self.name = name
+        self.when = when
+        self.fields = set()
+        self._conditions = []
+        for text in when.split(','):
+            if text.strip():
+                field, condition = compile_condition(text)
+                self.fields.add(field)
+                self._conditions.append(condition)
+
+        if not self._conditions:
+            raise ValueError('Filter rule has no conditions: ' + name)
+
+    def matches(self, values):
+        for condition in self._conditions:
+            if not condition(values):
+                return False
+
+        return True
+
+
+class OutlierDetector:
+
+    def __init__(self, fields=('spin_per_mph',), window=50, min_shots=10, max_zscore=4.0):
+        self.fields = tuple(fields)
+        self.window = window
+        self.min_shots = min_shots
+        self.max_zscore = max_zscore
+        self._windows = {}
+
+    def check(self, club, values):
+        for field in self.fields:
+            value = values.get(field, MISSING)
+            samples = self._windows.get((club, field))
+            if value is MISSING or samples is None or len(samples) < self.min_shots:
+                continue
+            median = statistics.median(samples)
+            spread = statistics.median([abs(s - median) for s in samples]) * MAD_TO_STD
+            if spread > 0.0 and abs(value - median) / spread > self.max_zscore:
+                return 'outlier_' + field
+
+    def accept(self, club, values):
+        for field in self.fields:
+            value = values.get(field, MISSING)
+            if value is not MISSING:
+                samples = self._windows.get((club, field))
+                if samples is None:
+                    samples = self._windows[(club, field)] = collections.deque(maxlen=self.window)
+                samples.append(value)
+
+
+class FilterEngine:
+
+    def __init__(self, rules, outliers=None):
+        self.rules = list(rules)
+        self.outliers = outliers
+        self.fields = set()
+        for rule in self.rules:
+            self.fields |= rule.fields
+        if outliers is not None:
+            self.fields |= set(outliers.fields)
+            if 'spin_per_mph' in outliers.fields:
+                self.fields |= {'back_spin', 'ball_speed'}
+        self.fields = tuple(sorted(self.fields))
+        self.checked = 0
+        self.rejections = collections.Counter()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, file_name='Filters.txt'):
+        if not os.path.isfile(file_name):
+            with open(file_name, 'w', encoding="utf8", errors='ignore') as (config_file):
+                config_file.write(DEFAULT_FILTER_CONFIG)
+        parser = configparser.ConfigParser()
+        parser.read(file_name, encoding='utf8')
+        return cls.from_parser(parser)
+
+    @classmethod
+    def from_parser(cls, parser):
+        rules = []
+        outliers = None
+        for section in parser.sections():
+            if section.startswith('Rule '):
+                if parser[section].getboolean('Enabled', True):
+                    rules.append(Rule(section[5:].strip(), parser[section].get('When', '')))
+            elif section == 'Outliers' and parser[section].getboolean('Enabled', True):
+                options = parser[section]
+                outliers = OutlierDetector([f.strip() for f in options.get('Fields', '').split(',') if f.strip()],
+                                           window=options.getint('Window', 50), min_shots=options.getint('MinShots', 10),
+                                           max_zscore=options.getfloat('MaxZScore', 4.0))
+
+        return cls(rules, outliers)
+
+    @classmethod
+    def default(cls):
+        parser = configparser.ConfigParser()
+        parser.read_string(DEFAULT_FILTER_CONFIG)
+        return cls.from_parser(parser)
+
+    def check(self, shot, club=None):
+        values = shot_values(shot, self.fields)
+        with self._lock:
+            self.checked += 1
+            for rule in self.rules:
+                if rule.matches(values):
+                    self.rejections[rule.name] += 1
+                    return rule.name
+
+            if self.outliers is not None:
+                rejected = self.outliers.check(club, values)
+                if rejected:
+                    self.rejections[rejected] += 1
+                    return rejected
+                self.outliers.accept(club, values)
+
+    def report(self):
+        rejected = sum(self.rejections.values())
+        lines = ['filters: checked %d, rejected %d' % (self.checked, rejected)]
+        for name, count in self.rejections.most_common():
+            lines.append('  %-24s %d' % (name, count))
+
+        return '\n'.join(lines)
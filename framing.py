@@ -0,0 +1,95 @@
+import codecs
+
+
+class LineFramer:
+
+    def __init__(self, encoding='utf-8', max_line_length=65536):
+        self.encoding = encoding
+        self.max_line_length = max_line_length
+        self._tail = bytearray()
+
+    def feed(self, data):
+        self._tail += data
+        end = self._tail.rfind(b'\n')
+        if end < 0:
+            if len(self._tail) > self.max_line_length:
+                del self._tail[:]
+            return []
+        complete = bytes(self._tail[:end])
+        del self._tail[:end + 1]
+        lines = []
+        for line in complete.split(b'\n'):
+            line = line.rstrip(b'\r')
+            if line:
+                lines.append(line.decode(self.encoding, errors='replace'))
+
+        return lines
+
+    def pending(self):
+        return len(self._tail)
+
+    def reset(self):
+        del self._tail[:]
+
+
+class JsonFramer:
+
+    def __init__(self, encoding='utf-8', max_message_length=1048576):
+        self.max_message_length = max_message_length
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        self._text = ''
+        self._scan = 0
+        self._start = -1
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, data):
+        self._text += self._decoder.decode(data)
+        messages = []
+        text = self._text
+        i = self._scan
+        while i < len(text):
+            c = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == '\\':
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+            elif c == '"':
+                self._in_string = self._depth > 0
+            elif c == '{' or c == '[':
+                if self._depth == 0:
+                    self._start = i
+                self._depth += 1
+            elif (c == '}' or c == ']') and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    messages.append(text[self._start:i + 1])
+                    self._start = -1
+            i += 1
+
+        if self._start < 0:
+            self._text = ''
+            self._scan = 0
+        else:
+            self._text = text[self._start:]
+            self._scan = i - self._start
+            self._start = 0
+            if len(self._text) > self.max_message_length:
+                self.reset()
+        return messages
+
+    def pending(self):
+        return len(self._text)
+
+    def reset(self):
+        self._decoder.reset()
+        self._text = ''
+        self._scan = 0
+        self._start = -1
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
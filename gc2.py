@@ -1,6 +1,43 @@
-from bluetooth import *  # Pybluez
-import math, sys, time
-from pyuac import runAsAdmin
+import os, threading, time
+from btcache import DiscoveryCache
+from capture import CaptureWriter, capture_file_name
+from framing import LineFramer
+from latency import ShotTrace
+from reconnect import ReconnectStateMachine
+from shot import ClubFollowUp, Shot
+from status import CONNECTED, CONNECTING, SCANNING, STOPPED, StatusPublisher
+
+
+FRESH_DATA_SECONDS = 4.0
+
+GC2_FIELDS = {
+    'CT': 'current_time',
+    'SN': 'serial_number',
+    'HW': 'hardware_version',
+    'SW': 'software_version',
+    'ID': 'ID',
+    'TM': 'shot_time',
+    'SP': 'ball_speed',
+    'AZ': 'horizontal_launch_angle',
+    'EL': 'launch_angle',
+    'TS': 'total_spin',
+    'SS': 'side_spin',
+    'BS': 'back_spin',
+    'CY': 'carry',
+    'TL': 'total',
+    'HMT': 'hmt',
+    'CS': 'club_speed',
+    'HP': 'swing_path',
+    'VP': 'angle_of_attack',
+    'FC': 'face_to_target',
+    'LI': 'lie',
+    'LF': 'dynamic_loft',
+    'HI': 'horizontal_impact_location',
+    'VI': 'veritcal_impact_location',
+    'FA': 'f_axis',
+    'CR': 'closure_rate',
+}
+
 
 class GC2:
 
@@ -10,6 +47,17 @@ class GC2:
         self.running = False
         self.last_received_data_time = None
         self._wait_for_hmt = True
+        self.follow_up = None
+        self._club_timeout = 5.0
+        self.socket_factory = None
+        self.capture_dir = None
+        self.status = StatusPublisher('bluetooth')
+        self.discovery_cache = DiscoveryCache()
+        self._scan_lock = threading.Lock()
+        self._refresh_interval = None
+        self._freshness_timer = None
+        self._freshness_lock = threading.Lock()
+        self.reconnect = ReconnectStateMachine('bluetooth')
 
     @property
     def wait_for_hmt(self):
@@ -19,16 +67,40 @@ class GC2:
     def wait_for_hmt(self, value):
         self._wait_for_hmt = value
 
+    @property
+    def split_delivery(self):
+        return self.follow_up is not None
+
+    @split_delivery.setter
+    def split_delivery(self, value):
+        if not value:
+            self.follow_up = None
+        elif self.follow_up is None:
+            self.follow_up = ClubFollowUp('shot_time', self._club_timeout)
+
+    @property
+    def club_timeout(self):
+        return self._club_timeout
+
+    @club_timeout.setter
+    def club_timeout(self, value):
+        self._club_timeout = value
+        follow_up = self.follow_up
+        if follow_up is not None:
+            follow_up.timeout = value
+
     def __del__(self):
         self.disconnect()
 
-    def scan(self):
-        if self.scanning:
+    def scan(self, background=False):
+        if not self._scan_lock.acquire(blocking=False):
             raise RuntimeError('Already scanning')
-        self.scanning = True
+        self.scanning = not background
+        self.publish_state()
         output_list = []
         try:
             try:
+                from bluetooth import discover_devices  # Pybluez
                 print('Scanning for GC2 Bluetooth Devices...')
                 nearby_devices = discover_devices(duration=4, lookup_names=True, flush_cache=True, lookup_class=False)
                 print('Found %d devices' % len(nearby_devices))
@@ -45,72 +117,97 @@ class GC2:
 
         finally:
             self.scanning = False
+            self._scan_lock.release()
+            self.publish_state()
 
+        self.discovery_cache.update_from_scan(output_list)
         return output_list
 
     def get_bluetooth_address(self, serial_number):
+        bt_addr = self.discovery_cache.lookup(serial_number)
+        if bt_addr:
+            return bt_addr
+        with self._scan_lock:
+            pass
+        bt_addr = self.discovery_cache.lookup(serial_number)
+        if bt_addr:
+            return bt_addr
         device_list = self.scan()
         for d in device_list:
             if str(serial_number) in d[1]:
                 return d[0]
 
-    @staticmethod
-    def get_gc2_value(line, identifier):
-        try:
-            return line.split(identifier + '=', 1)[1].split(',', 1)[0]
-        except:
-            return
+    def start_background_refresh(self, interval=3600.0):
+        running = self._refresh_interval is not None
+        self._refresh_interval = interval
+        if not running:
+            threading.Thread(target=(self.background_refresh_thread), daemon=True).start()
+
+    def stop_background_refresh(self):
+        self._refresh_interval = None
+
+    def background_refresh_thread(self):
+        while self._refresh_interval:
+            time.sleep(self._refresh_interval)
+            if self._refresh_interval and not self.running:
+                try:
+                    self.scan(background=True)
+                except RuntimeError:
+                    pass
 
     @staticmethod
     def parse_gc2_string(line):
-        identifier_dict = {}
-        identifier_dict['current_time'] = 'CT'
-        identifier_dict['serial_number'] = 'SN'
-        identifier_dict['hardware_version'] = 'HW'
-        identifier_dict['software_version'] = 'SW'
-        identifier_dict['ID'] = 'ID'
-        identifier_dict['shot_time'] = 'TM'
-        identifier_dict['ball_speed'] = 'SP'
-        identifier_dict['horizontal_launch_angle'] = 'AZ'
-        identifier_dict['launch_angle'] = 'EL'
-        identifier_dict['total_spin'] = 'TS'
-        identifier_dict['side_spin'] = 'SS'
-        identifier_dict['back_spin'] = 'BS'
-        identifier_dict['carry'] = 'CY'
-        identifier_dict['total'] = 'TL'
-        identifier_dict['hmt'] = 'HMT'
-        identifier_dict['club_speed'] = 'CS'
-        identifier_dict['swing_path'] = 'HP'
-        identifier_dict['angle_of_attack'] = 'VP'
-        identifier_dict['face_to_target'] = 'FC'
-        identifier_dict['lie'] = 'LI'
-        identifier_dict['dynamic_loft'] = 'LF'
-        identifier_dict['horizontal_impact_location'] = 'HI'
-        identifier_dict['veritcal_impact_location'] = 'VI'
-        identifier_dict['f_axis'] = 'FA'
-        identifier_dict['closure_rate'] = 'CR'
-        output_dict = {}
-        for key, identifier in identifier_dict.items():
-            value = GC2.get_gc2_value(line, identifier)
-            if value is not None:
-                output_dict[key] = value
-
-        return output_dict
+        if 'TM=' not in line:
+            return
+        text = {}
+        for token in line.split(','):
+            identifier, sep, value = token.partition('=')
+            if sep:
+                key = GC2_FIELDS.get(identifier.strip())
+                if key is not None and key not in text:
+                    text[key] = value.strip()
+
+        if 'shot_time' in text:
+            return Shot('bluetooth', text)
 
     def connect(self, callback, bt_addr=None, serial_number=None):
         self.running = True
+        self.publish_state()
         if bt_addr is None:
             bt_addr = self.get_bluetooth_address(serial_number)
-        runAsAdmin(cmdLine=(os.path.dirname(os.path.realpath(__file__)) + os.sep + 'btpair.exe', bt_addr))
+        socket_factory = self.socket_factory
+        protocol = None
+        if socket_factory is None:
+            from bluetooth import BluetoothSocket, RFCOMM  # Pybluez
+            if not self.reconnect.is_done('pairing:' + bt_addr):
+                from pyuac import runAsAdmin
+                runAsAdmin(cmdLine=(os.path.dirname(os.path.realpath(__file__)) + os.sep + 'btpair.exe', bt_addr))
+                self.reconnect.mark_done('pairing:' + bt_addr)
+            socket_factory = BluetoothSocket
+            protocol = RFCOMM
+        capture = None
+        if self.capture_dir:
+            capture = CaptureWriter(capture_file_name(self.capture_dir, 'bluetooth'), 'bluetooth')
         port = 1
+        self.reconnect.start()
         while self.running:
+            sock = None
+            linked = False
             try:
                 print('Connecting to: ' + bt_addr)
-                sock = BluetoothSocket(RFCOMM)
+                self.reconnect.connecting()
+                sock = socket_factory(protocol)
                 sock.connect((bt_addr, port))
                 sock.settimeout(10.0)
                 print('Connected GC2!')
-                line = ''
+                linked = True
+                self.reconnect.connected()
+                if self.socket_factory is None:
+                    self.discovery_cache.update(serial_number, bt_addr)
+                framer = LineFramer()
+                follow_up = self.follow_up
+                if follow_up is not None:
+                    follow_up.pending = None
                 last_shot_time = None
                 self.running = True
                 empty_message_count = 0
@@ -121,29 +218,32 @@ class GC2:
                         if empty_message_count < 100:
                             continue
                         break
-                    self.last_received_data_time = time.time()
-                    line += data.decode('UTF-8')
-                    if line:
-                        if line[(-1)] == '\n':
-                            shot_dictionary = None
-                            for l in line.splitlines():
-                                try:
-                                    parsed = GC2.parse_gc2_string(l)
-                                    if parsed:
-                                        shot_dictionary = parsed
-                                except KeyError:
-                                    print('Could not parse: ' + line)
-
-                            line = ''
-                            if self._wait_for_hmt:
-                                if shot_dictionary.get('hmt', '0') == '1':
-                                    continue
-                            if shot_dictionary is None:
+                    received_at = time.monotonic()
+                    self.data_received()
+                    if capture:
+                        capture.write(data, received_at)
+                    for line in framer.feed(data):
+                        follow_up = self.follow_up
+                        shot = GC2.parse_gc2_string(line)
+                        if shot is None or shot.shot_time is None:
+                            continue
+                        if self._wait_for_hmt and follow_up is None:
+                            if shot.hmt:
                                 continue
-                            if last_shot_time and last_shot_time != shot_dictionary.get('shot_time', '') and float(shot_dictionary.get('ball_speed', 0.0)) > 0.01:
-                                if callback:
-                                    callback(shot_dictionary)
-                        last_shot_time = shot_dictionary.get('shot_time', '')
+                        if last_shot_time is not None and last_shot_time != shot.shot_time:
+                            if callback:
+                                if follow_up is not None:
+                                    follow_up.ball(shot, received_at)
+                                shot.trace = ShotTrace('bluetooth', received_at).mark('parsed')
+                                shot.raw = line
+                                self.reconnect.shot()
+                                callback(shot)
+                        elif follow_up is not None and callback:
+                            if follow_up.club(shot, received_at) is not None:
+                                shot.trace = ShotTrace('bluetooth', received_at).mark('parsed')
+                                shot.raw = line
+                                callback(shot)
+                        last_shot_time = shot.shot_time
 
             except OSError as e:
                 try:
@@ -152,21 +252,64 @@ class GC2:
                     e = None
                     del e
 
-            sock.close()
+            if sock is not None:
+                sock.close()
+            self.last_received_data_time = None
+            self.publish_state()
             print('Disconnected GC2')
             if self.running:
-                time.sleep(1.0)
+                delay = self.reconnect.dropped() if linked else self.reconnect.failed()
+                self.reconnect.wait(delay, self.is_running)
+
+        self.reconnect.stop()
+        if capture:
+            capture.close()
+        self.publish_state()
 
     def disconnect(self):
         self.running = False
+        self.publish_state()
 
     def is_connected(self):
         if not self.running or self.last_received_data_time is None:
             return False
-        return time.time() - self.last_received_data_time <= 4.0
+        return time.time() - self.last_received_data_time <= FRESH_DATA_SECONDS
+
+    def data_received(self):
+        self.last_received_data_time = time.time()
+        self.publish_state()
+        with self._freshness_lock:
+            if self._freshness_timer is None:
+                self.schedule_freshness_check(FRESH_DATA_SECONDS)
+
+    def schedule_freshness_check(self, delay):
+        self._freshness_timer = threading.Timer(delay, self.check_freshness)
+        self._freshness_timer.daemon = True
+        self._freshness_timer.start()
+
+    def check_freshness(self):
+        with self._freshness_lock:
+            self.publish_state()
+            last_received_data_time = self.last_received_data_time
+            if self.is_connected() and last_received_data_time is not None:
+                self.schedule_freshness_check(last_received_data_time + FRESH_DATA_SECONDS - time.time() + 0.05)
+            else:
+                self._freshness_timer = None
 
     def is_running(self):
         return self.running
 
     def is_scanning(self):
-        return self.scanning
\ No newline at end of file
+        return self.scanning
+
+    def connection_state(self):
+        if self.is_scanning():
+            return SCANNING
+        if self.is_connected():
+            return CONNECTED
+        if self.is_running():
+            return CONNECTING
+        return STOPPED
+
+    def publish_state(self):
+        self.status.publish(self.connection_state())
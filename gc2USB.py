@@ -1,7 +1,5 @@
 import os
 import platform
-import usb.core
-import usb.backend.libusb1 as usb
 
 
 if 'Windows' in platform.architecture()[1]:
@@ -10,8 +8,47 @@ if 'Windows' in platform.architecture()[1]:
         os_ver = 'x86'
     os.environ['PATH'] += os.getcwd() + os.pathsep
     os.environ['PATH'] += os.path.dirname(os.path.realpath(__file__)) + os.sep + 'libusb' + os.sep + os_ver + os.pathsep
-import time
+import errno, time
+from array import array
 from ctypes import c_void_p, c_int
+from capture import CaptureWriter, capture_file_name
+from latency import ShotTrace
+from reconnect import ReconnectStateMachine
+from shot import ClubFollowUp, Shot
+from status import CONNECTED, CONNECTING, SCANNING, STOPPED, StatusPublisher
+
+
+USB_READ_ENDPOINT = 130
+USB_READ_SIZE = 10000
+USB_READ_TIMEOUT_MS = 100
+USB_IDS = ((65535, 65535), (11385, 272))
+
+
+GC2USB_FIELDS = {
+    'MSEC_SINCE_CONTACT': 'current_time',
+    'SHOT_ID': 'ID',
+    'SPEED_MPH': 'ball_speed',
+    'AZIMUTH_DEG': 'horizontal_launch_angle',
+    'ELEVATION_DEG': 'launch_angle',
+    'SPIN_RPM': 'total_spin',
+    'SIDE_RPM': 'side_spin',
+    'BACK_RPM': 'back_spin',
+    'HMT': 'hmt',
+    'CLUBSPEED_MPH': 'club_speed',
+    'HPATH_DEG': 'swing_path',
+    'VPATH_DEG': 'angle_of_attack',
+    'FACE_T_DEG': 'face_to_target',
+    'LIE_DEG': 'lie',
+    'LOFT_DEG': 'dynamic_loft',
+    'HIMPACT_MM': 'horizontal_impact_location',
+    'VIMPACT_MM': 'veritcal_impact_location',
+    'FAXIS_DEG': 'f_axis',
+    'CLOSING_RATE_DEGSEC': 'closure_rate',
+}
+
+
+def usb_location(dev):
+    return '%d-%s' % (dev.bus, '.'.join(str(p) for p in (dev.port_numbers or ())))
 
 
 class GC2USB:
@@ -22,6 +59,15 @@ class GC2USB:
         self.last_received_data_time = None
         self.dev = None
         self._wait_for_hmt = False
+        self.follow_up = None
+        self._club_timeout = 5.0
+        self.device_factory = None
+        self.capture_dir = None
+        self.usb_location = None
+        self.status = StatusPublisher('usb')
+        self.reconnect = ReconnectStateMachine('usb')
+        self._backend = None
+        self._usb_id_index = 0
 
     @property
     def wait_for_hmt(self):
@@ -31,101 +77,146 @@ class GC2USB:
     def wait_for_hmt(self, value):
         self._wait_for_hmt = value
 
+    @property
+    def split_delivery(self):
+        return self.follow_up is not None
+
+    @split_delivery.setter
+    def split_delivery(self, value):
+        if not value:
+            self.follow_up = None
+        elif self.follow_up is None:
+            self.follow_up = ClubFollowUp('ID', self._club_timeout)
+
+    @property
+    def club_timeout(self):
+        return self._club_timeout
+
+    @club_timeout.setter
+    def club_timeout(self, value):
+        self._club_timeout = value
+        follow_up = self.follow_up
+        if follow_up is not None:
+            follow_up.timeout = value
+
     def __del__(self):
         self.disconnect()
 
     @staticmethod
-    def get_gc2_value(block, identifier):
-        try:
-            return block.split(identifier + '=', 1)[1].split('\n', 1)[0].strip()
-        except:
-            return
+    def parse_gc2_usb_text(block):
+        text = {}
+        for line in block.split('\n'):
+            identifier, sep, value = line.partition('=')
+            if sep:
+                key = GC2USB_FIELDS.get(identifier.strip())
+                if key is not None:
+                    text[key] = value.strip()
 
-    @staticmethod
-    def parse_gc2_usb_text(block, output_dict={}):
-        identifier_dict = {}
-        identifier_dict['current_time'] = 'MSEC_SINCE_CONTACT'
-        identifier_dict['ID'] = 'SHOT_ID'
-        identifier_dict['ball_speed'] = 'SPEED_MPH'
-        identifier_dict['horizontal_launch_angle'] = 'AZIMUTH_DEG'
-        identifier_dict['launch_angle'] = 'ELEVATION_DEG'
-        identifier_dict['total_spin'] = 'SPIN_RPM'
-        identifier_dict['side_spin'] = 'SIDE_RPM'
-        identifier_dict['back_spin'] = 'BACK_RPM'
-        identifier_dict['hmt'] = 'HMT'
-        identifier_dict['club_speed'] = 'CLUBSPEED_MPH'
-        identifier_dict['swing_path'] = 'HPATH_DEG'
-        identifier_dict['angle_of_attack'] = 'VPATH_DEG'
-        identifier_dict['face_to_target'] = 'FACE_T_DEG'
-        identifier_dict['lie'] = 'LIE_DEG'
-        identifier_dict['dynamic_loft'] = 'LOFT_DEG'
-        identifier_dict['horizontal_impact_location'] = 'HIMPACT_MM'
-        identifier_dict['veritcal_impact_location'] = 'VIMPACT_MM'
-        identifier_dict['f_axis'] = 'FAXIS_DEG'
-        identifier_dict['closure_rate'] = 'CLOSING_RATE_DEGSEC'
-        for key, identifier in identifier_dict.items():
-            value = GC2USB.get_gc2_value(block, identifier)
-            if value is not None:
-                output_dict[key] = value
-
-        if int(output_dict.get('back_spin', -1)) == 3500:
-            if int(output_dict.get('side_spin', -1)) == 0:
-                output_dict['ball_speed'] = 0.0
-        return output_dict
+        return Shot('usb', text)
+
+    def load_backend(self):
+        if self._backend is None:
+            import usb.backend.libusb1 as libusb1
+            backend = libusb1.get_backend(find_library=(lambda x: 'libusb-1.0.dll'))
+            if backend is None:
+                return None
+            backend.lib.libusb_set_option.argtypes = [c_void_p, c_int]
+            backend.lib.libusb_set_option(backend.ctx, 1)
+            self._backend = backend
+            self.reconnect.mark_done('backend')
+        return self._backend
+
+    def find_device(self, backend):
+        import usb.core
+        match = None
+        if self.usb_location:
+            match = lambda d: usb_location(d) == self.usb_location
+        for index in sorted(range(len(USB_IDS)), key=lambda i: i != self._usb_id_index):
+            id_vendor, id_product = USB_IDS[index]
+            dev = usb.core.find(idVendor=id_vendor, idProduct=id_product, backend=backend, custom_match=match)
+            if dev is not None:
+                if index != self._usb_id_index:
+                    print('Alternate USB ID')
+                    self._usb_id_index = index
+                return dev
 
     def connect(self, callback, serial_number=None, bt_addr=None):
         self.running = True
-        backend = usb.get_backend(find_library=(lambda x: 'libusb-1.0.dll'))
-        if backend is None:
-            print('Could not load USB Backend!')
-            self.running = False
-            return
-        backend.lib.libusb_set_option.argtypes = [c_void_p, c_int]
-        backend.lib.libusb_set_option(backend.ctx, 1)
+        self.publish_state()
+        if self.device_factory is None:
+            import usb.util
+            backend = self.load_backend()
+            if backend is None:
+                print('Could not load USB Backend!')
+                self.running = False
+                self.publish_state()
+                return
+        capture = None
+        if self.capture_dir:
+            capture = CaptureWriter(capture_file_name(self.capture_dir, 'usb'), 'usb')
+        self.reconnect.start()
         while self.running:
+            linked = False
             try:
                 print('Connecting to: USB GC2')
-                self.dev = usb.core.find(idVendor=65535, idProduct=65535, backend=backend)
-                if self.dev is None:
-                    print('Alternate USB ID')
-                    self.dev = usb.core.find(idVendor=11385, idProduct=272, backend=backend)
+                self.reconnect.connecting()
+                if self.device_factory is not None:
+                    self.dev = self.device_factory()
+                else:
+                    self.dev = self.find_device(backend)
                 if self.dev is None:
                     raise ValueError('GC2 not found')
                 self.dev.set_configuration()
                 cfg = self.dev.get_active_configuration()
                 intf = cfg[(0, 0)]
                 print('Connected GC2!')
-                last_shot_id = -1
+                linked = True
+                self.reconnect.connected()
+                self.publish_state()
+                follow_up = self.follow_up
+                if follow_up is not None:
+                    follow_up.pending = None
+                last_shot_id = None
                 self.running = True
-                shot_dictionary = {}
+                read_buffer = array('B', bytes(USB_READ_SIZE))
+                read_view = memoryview(read_buffer)
                 while self.running:
                     sret = None
                     try:
-                        ret = self.dev.read(130, 10000, 100)
-                        sret = ''.join([chr(x) for x in ret])
+                        count = self.dev.read(USB_READ_ENDPOINT, read_buffer, USB_READ_TIMEOUT_MS)
+                        sret = str(read_view[:count], 'latin-1')
                     except KeyboardInterrupt:
                         break
+                    except OSError as e:
+                        if e.errno != errno.ETIMEDOUT:
+                            raise
                     except:
                         pass
 
                     self.last_received_data_time = time.time()
+                    received_at = time.monotonic()
                     if sret:
-                        try:
-                            shot_dictionary = self.parse_gc2_usb_text(sret, output_dict=shot_dictionary)
-                        except KeyError:
-                            print('Could not parse: ' + sret)
-
-                        if self._wait_for_hmt:
-                            if shot_dictionary.get('hmt', '0') == '1':
+                        if capture:
+                            capture.write(read_view[:count], received_at)
+                        follow_up = self.follow_up
+                        shot = self.parse_gc2_usb_text(sret)
+                        if self._wait_for_hmt and follow_up is None:
+                            if shot.hmt:
                                 continue
-                        if last_shot_id:
-                            if last_shot_id != shot_dictionary.get('ID', ''):
-                                if float(shot_dictionary.get('ball_speed', 0.0)) > 0.01:
-                                    if shot_dictionary.get('launch_angle', None) is not None:
-                                        if callback:
-                                            callback(shot_dictionary)
-                        shot_dictionary = {}
-                        last_shot_id = shot_dictionary.get('ID', -1)
+                        if shot.ID is not None and shot.ID != last_shot_id:
+                            if callback:
+                                if follow_up is not None:
+                                    follow_up.ball(shot, received_at)
+                                shot.trace = ShotTrace('usb', received_at).mark('parsed')
+                                shot.raw = sret
+                                self.reconnect.shot()
+                                callback(shot)
+                            last_shot_id = shot.ID
+                        elif follow_up is not None and callback:
+                            if follow_up.club(shot, received_at) is not None:
+                                shot.trace = ShotTrace('usb', received_at).mark('parsed')
+                                shot.raw = sret
+                                callback(shot)
 
             except (OSError, ValueError) as e:
                 try:
@@ -135,18 +226,27 @@ class GC2USB:
                     del e
 
             if self.dev:
-                try:
-                    usb.util.dispose_resources(self.dev)
-                except OSError:
-                    pass
+                if self.device_factory is None:
+                    try:
+                        usb.util.dispose_resources(self.dev)
+                    except OSError:
+                        pass
 
                 self.dev = None
+            self.publish_state()
             print('Disconnected GC2')
             if self.running:
-                time.sleep(1.0)
+                delay = self.reconnect.dropped() if linked else self.reconnect.failed()
+                self.reconnect.wait(delay, self.is_running)
+
+        self.reconnect.stop()
+        if capture:
+            capture.close()
+        self.publish_state()
 
     def disconnect(self):
         self.running = False
+        self.publish_state()
 
     def is_connected(self):
         if not self.running or self.dev is None:
@@ -157,4 +257,16 @@ class GC2USB:
         return self.running
 
     def is_scanning(self):
-        return False
\ No newline at end of file
+        return False
+
+    def connection_state(self):
+        if self.is_scanning():
+            return SCANNING
+        if self.is_connected():
+            return CONNECTED
+        if self.is_running():
+            return CONNECTING
+        return STOPPED
+
+    def publish_state(self):
+        self.status.publish(self.connection_state())
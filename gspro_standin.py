@@ -0,0 +1,156 @@
+import argparse, asyncio, json, random, threading, time
+from framing import JsonFramer
+
+
+REQUIRED_BALL_FIELDS = ('Speed', 'SpinAxis', 'TotalSpin', 'HLA', 'VLA')
+CLUBS = ('DR', 'W3', 'H4', 'I5', 'I7', 'I9', 'PW', 'SW', 'PT')
+
+
+def validate_shot(message):
+    if not isinstance(message, dict):
+        return 'Message is not an object'
+    for key in ('DeviceID', 'Units', 'ShotDataOptions'):
+        if key not in message:
+            return 'Missing ' + key
+    options = message['ShotDataOptions']
+    if not isinstance(options, dict):
+        return 'ShotDataOptions is not an object'
+    if options.get('ContainsBallData') in (True, 'true'):
+        ball = message.get('BallData')
+        if not isinstance(ball, dict):
+            return 'Missing BallData'
+        for key in REQUIRED_BALL_FIELDS:
+            try:
+                float(ball[key])
+            except (KeyError, TypeError, ValueError):
+                return 'Invalid BallData.' + key
+    if options.get('ContainsClubData') in (True, 'true'):
+        if not isinstance(message.get('ClubData'), dict):
+            return 'Missing ClubData'
+
+
+class StandInServer:
+
+    def __init__(self, host='127.0.0.1', port=921, reply_delay=0.0, split_replies=False, disconnect_after=None, handed_player='right', seed=None):
+        self.host = host
+        self.port = port
+        self.reply_delay = reply_delay
+        self.split_replies = split_replies
+        self.disconnect_after = disconnect_after
+        self.handed_player = handed_player
+        self.random = random.Random(seed)
+        self.received = []
+        self.rejected = []
+        self.connections = 0
+        self.clients = set()
+        self.loop = None
+        self.server = None
+        self.thread = None
+        self._ready = threading.Event()
+
+    def player_info(self):
+        return {'Code': 201, 'Message': 'GSPro Player Information',
+                'data': {'club_small': self.random.choice(CLUBS), 'distance_to_flag': round(self.random.uniform(5.0, 450.0), 1), 'handed_player': self.handed_player}}
+
+    async def send_message(self, writer, message):
+        payload = json.dumps(message, separators=(',', ':')).encode('utf-8') + b'\n'
+        if self.split_replies and len(payload) > 1:
+            cut = self.random.randint(1, len(payload) - 1)
+            writer.write(payload[:cut])
+            await writer.drain()
+            await asyncio.sleep(0.01)
+            payload = payload[cut:]
+        writer.write(payload)
+        await writer.drain()
+
+    async def handle_client(self, reader, writer):
+        self.connections += 1
+        self.clients.add(writer)
+        framer = JsonFramer()
+        shots = 0
+        try:
+            await self.send_message(writer, self.player_info())
+            while True:
+                data = await reader.read(4096)
+                if not data:
+                    break
+                received_at = time.monotonic()
+                for text in framer.feed(data):
+                    try:
+                        message = json.loads(text)
+                    except ValueError:
+                        message = None
+                    error = validate_shot(message) if message is not None else 'Invalid JSON'
+                    if error:
+                        self.rejected.append((received_at, error, text))
+                        await self.send_message(writer, {'Code': 501, 'Message': error})
+                        continue
+                    self.received.append((received_at, message))
+                    if self.reply_delay:
+                        await asyncio.sleep(self.reply_delay)
+                    if message['ShotDataOptions'].get('IsHeartBeat') in (True, 'true'):
+                        await self.send_message(writer, {'Code': 200, 'Message': 'Heartbeat received'})
+                        continue
+                    shots += 1
+                    await self.send_message(writer, {'Code': 200, 'Message': 'Shot received successfully'})
+                    await self.send_message(writer, self.player_info())
+                    if self.disconnect_after and shots >= self.disconnect_after:
+                        return
+
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self.clients.discard(writer)
+            writer.close()
+
+    def run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.server = self.loop.run_until_complete(asyncio.start_server(self.handle_client, self.host, self.port))
+        self.port = self.server.sockets[0].getsockname()[1]
+        self._ready.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self.server.close()
+            for writer in list(self.clients):
+                writer.close()
+            pending = asyncio.all_tasks(self.loop)
+            if pending:
+                self.loop.run_until_complete(asyncio.wait(pending, timeout=1.0))
+            self.loop.run_until_complete(self.server.wait_closed())
+            self.loop.close()
+
+    def start(self):
+        self.thread = threading.Thread(target=(self.run), daemon=True)
+        self.thread.start()
+        self._ready.wait()
+        return self.port
+
+    def stop(self):
+        if self.loop and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        if self.thread:
+            self.thread.join(timeout=2.0)
+
+    def receive_times(self):
+        return [t for t, _ in self.received]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local stand-in for the GSPro OpenAPI server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=921)
+    parser.add_argument('--delay', type=float, default=0.0, help='seconds to wait before replying to each shot')
+    parser.add_argument('--split', action='store_true', help='split every reply across two writes')
+    parser.add_argument('--disconnect-after', type=int, default=None, help='drop the client after this many shots')
+    parser.add_argument('--hand', default='right', choices=('right', 'left'))
+    args = parser.parse_args()
+    server = StandInServer(args.host, args.port, reply_delay=args.delay, split_replies=args.split, disconnect_after=args.disconnect_after, handed_player=args.hand)
+    print('GSPro stand-in listening on %s:%d' % (args.host, server.start()))
+    try:
+        while 1:
+            time.sleep(5.0)
+            print('Shots received: %d  Rejected: %d  Connections: %d' % (len(server.received), len(server.rejected), server.connections))
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,224 @@
+import argparse, asyncio, configparser, os, threading, time
+from functools import partial
+from delivery import deliver_shot
+from endpoint import parse_endpoint
+from filters import FilterEngine
+from pipeline import ShotPipeline
+from shot import CLUB
+from shotlog import DELIVERED, FAILED, REJECTED, ShotLog
+from sinks import ShotFanOut
+
+
+DEFAULT_HUB_CONFIG = '''[Bay 1]
+Transport=bluetooth
+Serial=
+Address=
+GSPro=127.0.0.1:921
+
+[Bay 2]
+Transport=usb
+Location=
+GSPro=127.0.0.1:922
+'''
+
+
+class BayConfig:
+
+    def __init__(self, name, transport='bluetooth', serial=None, address=None, location=None, gspro_host='127.0.0.1', gspro_port=921, wait_for_hmt=False, split_delivery=False, club_timeout=5.0):
+        self.name = name
+        self.transport = transport
+        self.serial = serial
+        self.address = address
+        self.location = location
+        self.gspro_host = gspro_host
+        self.gspro_port = gspro_port
+        self.wait_for_hmt = wait_for_hmt
+        self.split_delivery = split_delivery
+        self.club_timeout = club_timeout
+
+
+def read_hub_config(file_name='Hub.txt'):
+    if not os.path.isfile(file_name):
+        with open(file_name, 'w', encoding="utf8", errors='ignore') as (config_file):
+            config_file.write(DEFAULT_HUB_CONFIG)
+    parser = configparser.ConfigParser()
+    parser.read(file_name, encoding='utf8')
+    bays = []
+    for name in parser.sections():
+        section = parser[name]
+        transport = section.get('Transport', 'bluetooth').strip().lower()
+        serial = section.get('Serial', '').strip() or None
+        address = section.get('Address', '').strip() or None
+        if transport not in ('bluetooth', 'usb'):
+            print('Skipping %s: unknown transport %r in %s' % (name, transport, file_name))
+            continue
+        if transport == 'bluetooth' and not (serial or address):
+            print('Skipping %s: Serial or Address is required for Bluetooth in %s' % (name, file_name))
+            continue
+        host, port = parse_endpoint(section.get('GSPro', '127.0.0.1:921'))
+        bays.append(BayConfig(name, transport=transport,
+                              serial=serial,
+                              address=address,
+                              location=(section.get('Location', '').strip() or None),
+                              gspro_host=host, gspro_port=port,
+                              wait_for_hmt=section.getboolean('WaitForHMT', False),
+                              split_delivery=section.getboolean('SplitDelivery', False),
+                              club_timeout=section.getfloat('ClubTimeout', 5.0)))
+
+    unplaced = [bay.name for bay in bays if bay.transport == 'usb' and bay.location is None]
+    if len(unplaced) > 1:
+        print('Warning: %s have no Location, they will all open the first GC2 found on USB' % ', '.join(unplaced))
+    return bays
+
+
+class Bay:
+
+    def __init__(self, config, loop, pipeline, shot_log=None, filters=None, sinks=None, index=0):
+        from OpenAPI import OpenAPI
+        self.config = config
+        self.pipeline = pipeline
+        self.index = index
+        self.sinks = sinks
+        self.shot_log = shot_log
+        self.filters = filters if filters is not None else FilterEngine.default()
+        self.gspro = OpenAPI(server_ip=config.gspro_host, server_port=config.gspro_port, loop=loop)
+        if config.transport == 'usb':
+            from gc2USB import GC2USB
+            self.device = GC2USB()
+            self.device.usb_location = config.location
+        else:
+            from gc2 import GC2
+            self.device = GC2()
+        self.device.wait_for_hmt = config.wait_for_hmt
+        self.device.split_delivery = config.split_delivery
+        self.device.club_timeout = config.club_timeout
+        self.gspro.launch_monitor_ready = self.device.is_connected
+        self.received = 0
+        self.delivered = 0
+        self.club_delivered = 0
+        self.rejected = 0
+        self.failed = 0
+        try:
+            from shotstore import ShotStore
+            self.store = ShotStore()
+        except ImportError:
+            self.store = None
+        self.session_day = None
+        self.thread = None
+        self._last_report = (time.monotonic(), 0)
+
+    def start(self):
+        self.thread = threading.Thread(target=(self.run), name=self.config.name, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        if self.config.transport == 'usb':
+            self.device.connect(self.enqueue)
+        else:
+            self.device.connect(self.enqueue, bt_addr=self.config.address, serial_number=self.config.serial)
+
+    def enqueue(self, l):
+        if l.part != CLUB:
+            self.received += 1
+        self.pipeline.submit(l, self.deliver, key=self.index)
+        if self.sinks is not None:
+            self.sinks.publish(l)
+
+    def deliver(self, l):
+        queued = deliver_shot(self.gspro, l, self.filters, partial(self.sent, self.gspro.club, self.gspro.hand))
+        if queued is None:
+            self.rejected += 1
+            if self.shot_log is not None:
+                self.shot_log.append(l, REJECTED)
+        elif not queued:
+            self.sent(None, None, l, False)
+
+    def sent(self, club, hand, l, sent):
+        if self.shot_log is not None:
+            self.shot_log.append(l, DELIVERED if sent else FAILED)
+        if sent:
+            if l.part == CLUB:
+                self.club_delivered += 1
+            else:
+                self.delivered += 1
+            if self.store is not None:
+                if l.part == CLUB:
+                    self.store.merge_club(l)
+                else:
+                    self.new_day()
+                    self.store.append(l, club, hand)
+        else:
+            self.failed += 1
+
+    def new_day(self):
+        day = time.strftime('%Y-%m-%d')
+        if day != self.session_day:
+            self.session_day = day
+            self.store.new_session()
+
+    def stop(self):
+        self.device.disconnect()
+        self.gspro.disconnect()
+
+    def report(self):
+        now = time.monotonic()
+        last_time, last_delivered = self._last_report
+        self._last_report = (now, self.delivered)
+        rate = (self.delivered - last_delivered) * 60.0 / (now - last_time) if now > last_time else 0.0
+        return '%-12s %-9s device %-3s gspro %-3s received %5d delivered %5d club data %5d rejected %4d failed %4d  %6.1f shots/min' % (
+            self.config.name, self.config.transport, 'up' if self.device.is_connected() else 'down', 'up' if self.gspro.is_connected() else 'down',
+            self.received, self.delivered, self.club_delivered, self.rejected, self.failed, rate) + '\n' + self.gspro.report() + '\n' + self.filters.report() + self.session_report()
+
+    def session_report(self):
+        if self.store is None or self.session_day is None:
+            return ''
+        return '\nsession %d (%s)\n%s' % (self.store.session, self.session_day, self.store.report(self.store.session))
+
+
+class Hub:
+
+    def __init__(self, bay_configs, workers=2, queue_size=256, filter_config='Filters.txt', sink_config='Sinks.txt'):
+        self.loop = asyncio.new_event_loop()
+        self.loop_thread = threading.Thread(target=(self.loop.run_forever), name='hub-loop', daemon=True)
+        self.loop_thread.start()
+        self.pipeline = ShotPipeline(maxsize=queue_size, name='hub', workers=workers)
+        self.sinks = ShotFanOut().load_config(sink_config)
+        self.bays = [Bay(config, self.loop, self.pipeline, ShotLog(prefix=config.name.replace(' ', '_').lower()), FilterEngine.from_config(filter_config), self.sinks, index)
+                     for index, config in enumerate(bay_configs)]
+
+    def start(self):
+        for bay in self.bays:
+            bay.start()
+
+    def stop(self):
+        for bay in self.bays:
+            bay.stop()
+        self.pipeline.stop()
+        self.sinks.stop()
+        for bay in self.bays:
+            bay.shot_log.close()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    def report(self):
+        return '\n'.join([bay.report() for bay in self.bays] + [self.pipeline.report(), self.sinks.report()])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve several GC2 bays to their GSPro instances from one process')
+    parser.add_argument('--config', default='Hub.txt')
+    parser.add_argument('--filters', default='Filters.txt', help='misread filter rules')
+    parser.add_argument('--sinks', default='Sinks.txt', help='extra shot consumers shared by all bays')
+    parser.add_argument('--workers', type=int, default=2, help='delivery worker threads shared by all bays, each bay stays on one')
+    parser.add_argument('--report-interval', type=float, default=30.0)
+    args = parser.parse_args()
+    bay_configs = read_hub_config(args.config)
+    if not bay_configs:
+        parser.exit(1, 'No usable bays in %s\n' % args.config)
+    hub = Hub(bay_configs, workers=args.workers, filter_config=args.filters, sink_config=args.sinks)
+    hub.start()
+    try:
+        while 1:
+            time.sleep(args.report_interval)
+            print(hub.report())
+    except KeyboardInterrupt:
+        hub.stop()
@@ -0,0 +1,83 @@
+import collections, threading, time
+
+
+STAGES = ('received', 'parsed', 'dequeued', 'filtered', 'sent')
+PERCENTILES = (50, 95, 99)
+
+
+class ShotTrace:
+    __slots__ = ('transport', 'stamps')
+
+    def __init__(self, transport, received_at=None):
+        self.transport = transport
+        self.stamps = [('received', time.monotonic() if received_at is None else received_at)]
+
+    def mark(self, stage):
+        self.stamps.append((stage, time.monotonic()))
+        return self
+
+    def durations(self):
+        output = []
+        for (_, start), (stage, end) in zip(self.stamps, self.stamps[1:]):
+            output.append((stage, end - start))
+
+        if len(self.stamps) > 1:
+            output.append(('total', self.stamps[-1][1] - self.stamps[0][1]))
+        return output
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(p / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+class LatencyRecorder:
+
+    def __init__(self, window=1000):
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples = {}
+
+    def _append(self, key, duration):
+        samples = self._samples.get(key)
+        if samples is None:
+            samples = self._samples[key] = collections.deque(maxlen=self.window)
+        samples.append(duration)
+
+    def record(self, trace):
+        with self._lock:
+            for stage, duration in trace.durations():
+                self._append((trace.transport, stage), duration)
+
+    def record_duration(self, transport, stage, duration):
+        with self._lock:
+            self._append((transport, stage), duration)
+
+    def summary(self):
+        with self._lock:
+            snapshot = {key: sorted(samples) for key, samples in self._samples.items()}
+        output = {}
+        for key, values in snapshot.items():
+            output[key] = (len(values),) + tuple(percentile(values, p) for p in PERCENTILES)
+
+        return output
+
+    def dump(self):
+        lines = ['%-10s %-10s %6s %10s %10s %10s' % ('transport', 'stage', 'count', 'p50 ms', 'p95 ms', 'p99 ms')]
+        for (transport, stage), (count, p50, p95, p99) in sorted(self.summary().items()):
+            lines.append('%-10s %-10s %6d %10.3f %10.3f %10.3f' % (transport, stage, count, p50 * 1000.0, p95 * 1000.0, p99 * 1000.0))
+
+        return '\n'.join(lines)
+
+    def write_log(self, file_name='latency.log'):
+        with open(file_name, 'a', encoding='utf8') as (log_file):
+            log_file.write(time.strftime('%Y-%m-%d %H:%M:%S') + '\n' + self.dump() + '\n\n')
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+
+
+recorder = LatencyRecorder()
@@ -0,0 +1,165 @@
+import argparse, asyncio, random, threading, time
+from endpoint import parse_endpoint
+from latency import percentile
+from shotmessage import ShotMessage
+
+
+def random_shot(rng, with_club=False):
+    shot = ShotMessage.from_spin(rng.uniform(20, 180), rng.uniform(-7, 7), rng.uniform(3, 45), rng.uniform(1500, 10000), rng.uniform(-2500, 2500))
+    if with_club:
+        shot.club_speed = rng.uniform(20, 120)
+        shot.path = rng.uniform(-7, 7)
+        shot.face_to_target = rng.uniform(-7, 7) + shot.path
+    return shot
+
+
+class LoadStats:
+
+    def __init__(self):
+        self.sent = 0
+        self.errors = 0
+        self.late = 0
+        self.latencies = []
+        self._lock = threading.Lock()
+
+    def record(self, ok, latency, late):
+        with self._lock:
+            if ok:
+                self.sent += 1
+                self.latencies.append(latency)
+            else:
+                self.errors += 1
+            self.late += late
+
+    def snapshot(self):
+        with self._lock:
+            return self.sent, self.errors, self.late, sorted(self.latencies)
+
+
+class SimulatedMonitor:
+
+    def __init__(self, index, host, port, loop, stats, interval, club_fraction, max_shot_age, seed=None):
+        from OpenAPI import OpenAPI
+        self.index = index
+        self.stats = stats
+        self.interval = interval
+        self.club_fraction = club_fraction
+        self.rng = random.Random(seed)
+        self.gspro = OpenAPI(server_ip=host, server_port=port, loop=loop, max_shot_age=max_shot_age)
+        self.gspro.launch_monitor_ready = lambda: True
+        self.gspro.echo_shots = False
+        self.thread = None
+
+    def start(self, deadline, offset):
+        self.thread = threading.Thread(target=(self.run), args=(deadline, offset), name='monitor-%d' % self.index, daemon=True)
+        self.thread.start()
+
+    def run(self, deadline, offset):
+        next_shot = time.monotonic() + offset
+        while True:
+            now = time.monotonic()
+            if next_shot >= deadline:
+                return
+            if next_shot > now:
+                time.sleep(next_shot - now)
+            shot = random_shot(self.rng, self.rng.random() < self.club_fraction)
+            late = time.monotonic() - next_shot > self.interval
+            start = time.perf_counter()
+            done = lambda sent, start=start, late=late: self.stats.record(sent, time.perf_counter() - start, late)
+            if self.gspro.send_shot(shot, done=done) is None:
+                done(False)
+            next_shot += self.interval
+
+    def stop(self):
+        self.gspro.disconnect()
+
+
+class LoadGenerator:
+
+    def __init__(self, endpoints, monitors=10, rate=10.0, duration=30.0, club_fraction=0.5, max_shot_age=2.0, seed=None):
+        self.endpoints = endpoints
+        self.duration = duration
+        self.rate = rate
+        self.stats = LoadStats()
+        self.started = None
+        self.finished = None
+        self.loop = asyncio.new_event_loop()
+        self.loop_thread = threading.Thread(target=(self.loop.run_forever), name='loadgen-loop', daemon=True)
+        self.loop_thread.start()
+        interval = monitors / rate
+        self.monitors = [SimulatedMonitor(i, *endpoints[i % len(endpoints)], loop=self.loop, stats=self.stats, interval=interval, club_fraction=club_fraction,
+                                          max_shot_age=max_shot_age, seed=(None if seed is None else seed + i)) for i in range(monitors)]
+
+    def wait_connected(self, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            connected = sum(1 for m in self.monitors if m.gspro.is_connected())
+            if connected == len(self.monitors):
+                break
+            time.sleep(0.05)
+        return sum(1 for m in self.monitors if m.gspro.is_connected())
+
+    def run(self, report_interval=5.0):
+        self.started = time.monotonic()
+        deadline = self.started + self.duration
+        for i, monitor in enumerate(self.monitors):
+            monitor.start(deadline, monitor.interval * i / len(self.monitors))
+        for monitor in self.monitors:
+            while monitor.thread.is_alive():
+                monitor.thread.join(report_interval or None)
+                if report_interval and monitor.thread.is_alive():
+                    print(self.report())
+        self.finished = time.monotonic()
+
+    def stop(self):
+        for monitor in self.monitors:
+            monitor.stop()
+        time.sleep(0.3)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    def report(self):
+        sent, errors, late, latencies = self.stats.snapshot()
+        elapsed = (self.finished or time.monotonic()) - self.started
+        expired = sum(m.gspro.outbound_expired for m in self.monitors)
+        depth = sum(len(m.gspro.outbound) for m in self.monitors)
+        connected = sum(1 for m in self.monitors if m.gspro.is_connected())
+        return ('%.1f s: sent %d (%.1f shots/s of %.1f target), errors %d (expired %d), behind schedule %d, queued %d, connected %d/%d, '
+                'send p50 %.2f ms p95 %.2f ms p99 %.2f ms max %.2f ms') % (
+            elapsed, sent, sent / elapsed if elapsed else 0.0, self.rate, errors, expired, late, depth, connected, len(self.monitors),
+            percentile(latencies, 50) * 1000.0, percentile(latencies, 95) * 1000.0, percentile(latencies, 99) * 1000.0, latencies[-1] * 1000.0 if latencies else 0.0)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Drive GSPro OpenAPI endpoints with many simulated launch monitors')
+    parser.add_argument('--gspro', action='append', default=[], help='GSPro OpenAPI host[:port], repeat for several endpoints')
+    parser.add_argument('--standin', type=int, default=0, help='start this many local GSPro stand-ins and target them')
+    parser.add_argument('--standin-delay', type=float, default=0.0, help='reply delay of the local stand-ins')
+    parser.add_argument('--monitors', type=int, default=10, help='simulated launch monitors, one connection each')
+    parser.add_argument('--rate', type=float, default=10.0, help='total shots per second across all monitors')
+    parser.add_argument('--duration', type=float, default=30.0, help='seconds to send for')
+    parser.add_argument('--club-fraction', type=float, default=0.5, help='fraction of shots that carry club data')
+    parser.add_argument('--max-shot-age', type=float, default=2.0, help='seconds a shot may wait for a reconnect before it counts as an error')
+    parser.add_argument('--report-interval', type=float, default=5.0)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+    servers = []
+    endpoints = [parse_endpoint(value) for value in args.gspro]
+    if args.standin or not endpoints:
+        from gspro_standin import StandInServer
+        for i in range(args.standin or 1):
+            server = StandInServer(port=0, reply_delay=args.standin_delay, seed=(None if args.seed is None else args.seed + i))
+            endpoints.append(('127.0.0.1', server.start()))
+            servers.append(server)
+    generator = LoadGenerator(endpoints, monitors=args.monitors, rate=args.rate, duration=args.duration, club_fraction=args.club_fraction,
+                              max_shot_age=args.max_shot_age, seed=args.seed)
+    print('Connected %d of %d monitors to %s' % (generator.wait_connected(), args.monitors, ', '.join('%s:%d' % e for e in endpoints)))
+    try:
+        generator.run(args.report_interval)
+    except KeyboardInterrupt:
+        pass
+    print(generator.report())
+    generator.stop()
+    for server in servers:
+        shots = [m for _, m in server.received if not m.get('ShotDataOptions', {}).get('IsHeartBeat')]
+        print('stand-in :%d received %d shots, rejected %d, connections %d' % (server.port, len(shots), len(server.rejected), server.connections))
+        server.stop()
@@ -1,8 +1,21 @@
 from functools import partial
-import os, subprocess, threading, time, tkinter as tk
+import os, queue, threading, time, tkinter as tk
 from gc2 import GC2
 from gc2USB import GC2USB
 from OpenAPI import OpenAPI
+from latency import recorder
+from pipeline import ShotPipeline
+from delivery import deliver_shot
+from filters import FilterEngine
+from shot import CLUB
+from sinks import ShotFanOut
+from state import default_store
+from shotlog import DELIVERED, FAILED, REJECTED, ShotLog
+from status import CONNECTED, CONNECTING, SCANNING, STOPPED
+try:
+    from shotstore import ShotStore
+except ImportError:
+    ShotStore = None
 from pyuac import runAsAdmin
 
 
@@ -13,17 +26,16 @@ root.title('OpenAPI GC2 Interface ' + GC2_GUI_VERSION)
 g = GC2()
 u = GC2USB()
 p = OpenAPI()
-saved_file_name = 'lastgc2.txt'
-saved_serial = ''
-saved_addr = '127.0.0.1'
-try:
-    with open('lastgc2.txt', 'r', encoding="utf-8", errors='ignore') as (saved_gc2):
-        f = saved_gc2.read().splitlines()
-        if len(f) == 2:
-            saved_serial = f[0]
-            saved_addr = f[1]
-except FileNotFoundError:
-    pass
+shot_pipeline = ShotPipeline(name='gspro')
+status_events = queue.Queue()
+shot_store = ShotStore() if ShotStore else None
+shot_log = ShotLog()
+shot_filters = FilterEngine.from_config()
+shot_sinks = ShotFanOut().load_config()
+g.capture_dir = u.capture_dir = os.environ.get('GC2_CAPTURE_DIR')
+p.launch_monitor_ready = lambda: g.is_connected() or u.is_connected()
+state = default_store()
+saved_serial = state.get('last_serial')
 
 gc2_mac_address_dict = {}
 
@@ -72,52 +84,30 @@ class GC2ConnectTask(threading.Thread):
 
     def run(self):
         if not self.gc2.is_connected():
-            try:
-                os.remove('lastgc2.txt')
-            except FileNotFoundError:
-                pass
-
-            try:
-                with open('lastgc2.txt', 'w', encoding="utf8", errors='ignore') as (saved_gc2):
-                    saved_gc2.write(str(self.serial) + '\n')
-                    if self.bt_addr:
-                        saved_gc2.write(str(self.bt_addr))
-            except FileNotFoundError:
-                pass
-
-            subprocess.check_call(['attrib', '+H', 'lastgc2.txt'])
-            self.gc2.connect((self.cb), serial_number=(self.serial), bt_addr=(self.bt_addr))
+            if self.serial:
+                state.remember_device(self.serial, self.bt_addr)
+            self.gc2.connect((self.enqueue), serial_number=(self.serial), bt_addr=(self.bt_addr))
         else:
             print('Gc2 already connected?')
 
+    def enqueue(self, l):
+        shot_pipeline.submit(l, self.cb)
+        shot_sinks.publish(l)
+
     def cb(self, l):
-        clubpath = l.get('swing_path', None)
-        if clubpath is not None:
-            try:
-                clubpath = -1.0 * float(clubpath)
-            except:
-                pass
-
-        face_to_path = None
-        face_to_target = l.get('face_to_target', None)
-        if face_to_target is not None:
-            if clubpath is not None:
-                try:
-                    face_to_path = -1.0 * float(face_to_target) - clubpath
-                except:
-                    pass
-
-        if l.get('back_spin', 0.0) == 0.0:
-            if l.get('side_spin', 0.0) == 0.0:
-                print('Rejecting shot due to zero total spin, assumed misread.')
-                return
-        if l.get('back_spin', 0.0) == 2222.0:
-            print('Rejecting shot due 2222 backspin, assumed misread.')
-            return
-        self.gspro.launch_ball((l.get('ball_speed', 0.0)), (l.get('horizontal_launch_angle', 0.0)), (l.get('launch_angle', 0.0)), (l.get('back_spin', 0.0)), (l.get('side_spin', 0.0)), clubspeed=(l.get('club_speed', None)),
-                               clubface=face_to_path,
-                               clubpath=clubpath,
-                               sweetspot=(l.get('horizontal_impact_location', None)))
+        queued = deliver_shot(self.gspro, l, shot_filters, partial(self.sent, self.gspro.club, self.gspro.hand))
+        if queued is None:
+            shot_log.append(l, REJECTED)
+        elif not queued:
+            shot_log.append(l, FAILED)
+
+    def sent(self, club, hand, l, sent):
+        shot_log.append(l, DELIVERED if sent else FAILED)
+        if sent and shot_store is not None:
+            if l.part == CLUB:
+                shot_store.merge_club(l)
+            else:
+                shot_store.append(l, club, hand)
 
 
 def scanForGC2s(listbox):
@@ -141,13 +131,28 @@ def setWaitForHMT(wait_for_hmt_var):
         g.wait_for_hmt = True
     else:
         g.wait_for_hmt = False
+    state.set('wait_for_hmt', g.wait_for_hmt)
+
+
+def setSplitDelivery(split_delivery_var):
+    g.split_delivery = u.split_delivery = split_delivery_var.get()
+    state.set('split_delivery', g.split_delivery)
+
+
+def applyState(store):
+    g.wait_for_hmt = store.get('wait_for_hmt')
+    g.split_delivery = u.split_delivery = store.get('split_delivery')
+    g.club_timeout = u.club_timeout = store.get('club_timeout')
+    p.server_ip = store.get('gspro_ip')
+    p.server_port = store.get('gspro_port')
 
 
 def connect(serial_entry):
     serial = serial_entry.get()
     bt_addr = None
-    if serial == saved_serial:
-        bt_addr = saved_addr
+    saved_device = state.device(serial)
+    if saved_device is not None and saved_device.address:
+        bt_addr = saved_device.address
     for key, value in gc2_mac_address_dict.items():
         if key[14:] == serial:
             bt_addr = value
@@ -167,9 +172,39 @@ def usb_disconnect():
     u.disconnect()
 
 
+def dumpLatency(evt=None):
+    print(recorder.dump())
+    print(shot_pipeline.report())
+    print(p.report())
+    print(shot_filters.report())
+    print(shot_sinks.report())
+    print(g.reconnect.report())
+    print(u.reconnect.report())
+
+
+def dumpSessionStats(evt=None):
+    if shot_store is None:
+        print('Session statistics need numpy')
+    else:
+        print('Session %d' % shot_store.session)
+        print(shot_store.report(shot_store.session))
+
+
+def startNewSession(evt=None):
+    if shot_store is None:
+        print('Session statistics need numpy')
+    else:
+        dumpSessionStats()
+        print('Started session %d' % shot_store.new_session())
+
+
 def on_closing():
     disconnect()
     p.disconnect()
+    recorder.write_log()
+    shot_log.close()
+    shot_sinks.stop()
+    state.flush()
     root.destroy()
 
 
@@ -180,40 +215,42 @@ gc2_entry = tk.Entry(serial_frame, textvariable=gc2_selected_var, width=8, justi
 connect_button = tk.Button(serial_frame, text='Connect Bluetooth')
 usb_button = None
 
-def drawConnectionStatus():
-    if p.is_connected():
-        protee_connected_indicator.configure(bg='sea green')
-    else:
-        protee_connected_indicator.configure(bg='red4')
-    if g.is_scanning():
-        gc2_connected_indicator.configure(bg='RoyalBlue3')
-        connect_button.configure(text='Scanning', state=(tk.DISABLED))
+STATE_COLOURS = {CONNECTED: 'sea green', CONNECTING: 'goldenrod1', SCANNING: 'RoyalBlue3', STOPPED: 'red4'}
+
+
+def drawConnectionStatus(name, state):
+    if name == 'openapi':
+        protee_connected_indicator.configure(bg=('sea green' if state == CONNECTED else 'red4'))
+        return
+    if name == 'bluetooth':
+        indicator, button, label = gc2_connected_indicator, connect_button, 'Bluetooth'
+        connect_command, disconnect_command = partial(connect, gc2_entry), disconnect
     else:
-        if g.is_connected():
-            gc2_connected_indicator.configure(bg='sea green')
-            connect_button.configure(text='Disconnect Bluetooth', state=(tk.NORMAL), command=disconnect)
-        else:
-            if g.is_running():
-                gc2_connected_indicator.configure(bg='goldenrod1')
-                connect_button.configure(text='Disconnect Bluetooth', state=(tk.NORMAL), command=disconnect)
-            else:
-                gc2_connected_indicator.configure(bg='red4')
-                connect_button.configure(text='Connect Bluetooth', state=(tk.NORMAL), command=(partial(connect, gc2_entry)))
-    if u.is_scanning():
-        usb_connected_indicator.configure(bg='RoyalBlue3')
-        usb_button.configure(text='Scanning', state=(tk.DISABLED))
+        indicator, button, label = usb_connected_indicator, usb_button, 'USB'
+        connect_command, disconnect_command = usb_connect, usb_disconnect
+    indicator.configure(bg=STATE_COLOURS[state])
+    if state == SCANNING:
+        button.configure(text='Scanning', state=(tk.DISABLED))
+    elif state == STOPPED:
+        button.configure(text='Connect ' + label, state=(tk.NORMAL), command=connect_command)
     else:
-        if u.is_connected():
-            usb_connected_indicator.configure(bg='sea green')
-            usb_button.configure(text='Disconnect USB', state=(tk.NORMAL), command=usb_disconnect)
-        else:
-            if u.is_running():
-                usb_connected_indicator.configure(bg='goldenrod1')
-                usb_button.configure(text='Disconnect USB', state=(tk.NORMAL), command=usb_disconnect)
-            else:
-                usb_connected_indicator.configure(bg='red4')
-                usb_button.configure(text='Connect USB', state=(tk.NORMAL), command=usb_connect)
-    root.after(500, drawConnectionStatus)
+        button.configure(text='Disconnect ' + label, state=(tk.NORMAL), command=disconnect_command)
+
+
+def onStatusChanged(evt=None):
+    while True:
+        try:
+            name, state = status_events.get_nowait()
+        except queue.Empty:
+            return
+        drawConnectionStatus(name, state)
+
+
+def notifyStatusChanged():
+    try:
+        root.event_generate('<<StatusChanged>>', when='tail')
+    except (RuntimeError, tk.TclError):
+        pass
 
 
 tk.Label(serial_frame, text='Selected GC2 Serial (Number Only)').pack(side=(tk.LEFT))
@@ -240,9 +277,21 @@ options_frame = tk.Frame(body_frame)
 wait_for_hmt = tk.BooleanVar()
 waitForHMTCheck = tk.Checkbutton(options_frame, text='Wait for HMT', variable=wait_for_hmt)
 waitForHMTCheck['command'] = partial(setWaitForHMT, wait_for_hmt)
-waitForHMTCheck.deselect()
-g.wait_for_hmt = False
+if state.get('wait_for_hmt'):
+    waitForHMTCheck.select()
+else:
+    waitForHMTCheck.deselect()
 waitForHMTCheck.pack(side=(tk.TOP))
+split_delivery = tk.BooleanVar()
+splitDeliveryCheck = tk.Checkbutton(options_frame, text='Club data after ball', variable=split_delivery)
+splitDeliveryCheck['command'] = partial(setSplitDelivery, split_delivery)
+if state.get('split_delivery'):
+    splitDeliveryCheck.select()
+else:
+    splitDeliveryCheck.deselect()
+applyState(state)
+state.start_watching(listener=applyState)
+splitDeliveryCheck.pack(side=(tk.TOP))
 options_frame.pack(side=(tk.LEFT), anchor=(tk.N), fill=(tk.X))
 usb_button = tk.Button(body_frame, text='Connect USB')
 usb_button.pack(side=(tk.RIGHT), anchor=(tk.S), padx=10)
@@ -260,8 +309,14 @@ tk.Label(connection_status_frame, text='\tGC2 USB').pack(side=(tk.LEFT))
 usb_connected_indicator = tk.Frame(connection_status_frame, bg='red4')
 usb_connected_indicator.pack(side=(tk.LEFT), ipadx=7, ipady=7, padx=5)
 connection_status_frame.pack(side=(tk.BOTTOM), fill=(tk.X))
-drawConnectionStatus()
+root.bind('<<StatusChanged>>', onStatusChanged)
+for status_source in (p, g, u):
+    status_source.status.attach(status_events, notifyStatusChanged)
+root.after_idle(onStatusChanged)
 root.protocol('WM_DELETE_WINDOW', on_closing)
+root.bind('<F2>', dumpLatency)
+root.bind('<F3>', dumpSessionStats)
+root.bind('<F4>', startNewSession)
 try:
     root.mainloop()
 except KeyboardInterrupt:
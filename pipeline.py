@@ -0,0 +1,101 @@
+import collections, threading, time
+
+
+DROP_OLDEST = 'drop_oldest'
+DROP_NEWEST = 'drop_newest'
+BLOCK = 'block'
+POLICIES = (DROP_OLDEST, DROP_NEWEST, BLOCK)
+
+
+class ShotPipeline:
+
+    def __init__(self, maxsize=32, policy=DROP_OLDEST, block_timeout=0.5, name='shots', workers=1, traced=True):
+        if policy not in POLICIES:
+            raise ValueError('Unknown queue policy: ' + str(policy))
+        self.maxsize = maxsize
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.name = name
+        self.traced = traced
+        self.enqueued = 0
+        self.processed = 0
+        self.dropped = 0
+        self.failed = 0
+        self.max_depth = 0
+        self.handler_time = 0.0
+        self._queues = [collections.deque() for _ in range(max(1, workers))]
+        self._next_queue = 0
+        self._condition = threading.Condition()
+        self._running = True
+        self._lock = threading.Lock()
+        self._threads = []
+        for i in range(len(self._queues)):
+            thread = threading.Thread(target=(self.run), args=(self._queues[i],), name='%s-%d' % (name, i), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, shot, handler, key=None):
+        with self._condition:
+            if key is None:
+                key = self._next_queue
+                self._next_queue += 1
+            queue = self._queues[key % len(self._queues)]
+            if len(queue) >= self.maxsize:
+                if self.policy == DROP_NEWEST:
+                    self.dropped += 1
+                    return False
+                if self.policy == BLOCK:
+                    deadline = time.monotonic() + self.block_timeout
+                    while len(queue) >= self.maxsize:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0 or not self._condition.wait(remaining):
+                            self.dropped += 1
+                            return False
+                else:
+                    queue.popleft()
+                    self.dropped += 1
+            queue.append((shot, handler))
+            self.enqueued += 1
+            self.max_depth = max(self.max_depth, len(queue))
+            self._condition.notify_all()
+        return True
+
+    def run(self, queue):
+        while True:
+            with self._condition:
+                while self._running and not queue:
+                    self._condition.wait()
+                if not queue:
+                    return
+                shot, handler = queue.popleft()
+                self._condition.notify_all()
+            if self.traced and shot.trace is not None:
+                shot.trace.mark('dequeued')
+            start = time.perf_counter()
+            failed = False
+            try:
+                handler(shot)
+            except Exception as e:
+                failed = True
+                print('Shot handler failed: ' + repr(e))
+            with self._lock:
+                self.failed += failed
+                self.handler_time += time.perf_counter() - start
+                self.processed += 1
+
+    def depth(self):
+        return sum(len(queue) for queue in self._queues)
+
+    def stop(self, timeout=1.0):
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def stats(self):
+        return {'depth': self.depth(), 'max_depth': self.max_depth, 'enqueued': self.enqueued, 'processed': self.processed, 'dropped': self.dropped, 'failed': self.failed,
+                'mean_handler_ms': self.handler_time * 1000.0 / self.processed if self.processed else 0.0}
+
+    def report(self):
+        return self.name + ': depth %(depth)d (max %(max_depth)d), enqueued %(enqueued)d, processed %(processed)d, dropped %(dropped)d, failed %(failed)d, handler %(mean_handler_ms).3f ms' % self.stats()
@@ -0,0 +1,102 @@
+import collections, random, time
+
+
+IDLE = 'idle'
+CONNECTING = 'connecting'
+CONNECTED = 'connected'
+BACKOFF = 'backoff'
+STOPPED = 'stopped'
+
+
+class ReconnectStateMachine:
+
+    def __init__(self, name, fast_retries=2, fast_delay=0.05, base_delay=0.25, max_delay=5.0, jitter=0.25, history=100):
+        self.name = name
+        self.fast_retries = fast_retries
+        self.fast_delay = fast_delay
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.state = IDLE
+        self.failures = 0
+        self.attempts = 0
+        self.completed_steps = set()
+        self.reconnect_times = collections.deque(maxlen=history)
+        self.first_shot_times = collections.deque(maxlen=history)
+        self._random = random.Random()
+        self._outage_start = None
+        self._connected_at = None
+        self._waiting_for_first_shot = False
+
+    def is_done(self, step):
+        return step in self.completed_steps
+
+    def mark_done(self, step):
+        self.completed_steps.add(step)
+
+    def forget(self, step):
+        self.completed_steps.discard(step)
+
+    def start(self):
+        self.state = CONNECTING
+        self.failures = 0
+        self._outage_start = time.monotonic()
+
+    def connecting(self):
+        self.state = CONNECTING
+        self.attempts += 1
+        if self._outage_start is None:
+            self._outage_start = time.monotonic()
+
+    def connected(self):
+        now = time.monotonic()
+        self.state = CONNECTED
+        self.failures = 0
+        if self._outage_start is not None:
+            self.reconnect_times.append(now - self._outage_start)
+        self._connected_at = now
+        self._waiting_for_first_shot = True
+
+    def shot(self):
+        if self._waiting_for_first_shot:
+            self._waiting_for_first_shot = False
+            if self._outage_start is not None:
+                self.first_shot_times.append(time.monotonic() - self._outage_start)
+            self._outage_start = None
+
+    def dropped(self):
+        self.state = BACKOFF
+        self._waiting_for_first_shot = False
+        self._outage_start = time.monotonic()
+        return self.next_delay()
+
+    def failed(self):
+        self.state = BACKOFF
+        self.failures += 1
+        return self.next_delay()
+
+    def next_delay(self):
+        if self.failures < self.fast_retries:
+            return self.fast_delay
+        delay = min(self.max_delay, self.base_delay * 2 ** (self.failures - self.fast_retries))
+        return delay * (1.0 + self._random.uniform(-self.jitter, self.jitter))
+
+    def wait(self, delay, keep_waiting, step=0.05):
+        deadline = time.monotonic() + delay
+        while keep_waiting():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return True
+            time.sleep(min(step, remaining))
+
+        return False
+
+    def stop(self):
+        self.state = STOPPED
+        self._waiting_for_first_shot = False
+        self._outage_start = None
+
+    def report(self):
+        def last(values):
+            return '%.3f s' % values[-1] if values else '-'
+        return '%s: %s, attempts %d, last reconnect %s, last time to first shot %s' % (self.name, self.state, self.attempts, last(self.reconnect_times), last(self.first_shot_times))
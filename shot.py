@@ -0,0 +1,116 @@
+def flag(text):
+    return text.strip() == '1'
+
+
+SHOT_FIELDS = (
+    ('current_time', 'ms', float),
+    ('serial_number', None, str),
+    ('hardware_version', None, str),
+    ('software_version', None, str),
+    ('ID', None, str),
+    ('shot_time', 'ms', float),
+    ('ball_speed', 'mph', float),
+    ('horizontal_launch_angle', 'deg', float),
+    ('launch_angle', 'deg', float),
+    ('total_spin', 'rpm', float),
+    ('side_spin', 'rpm', float),
+    ('back_spin', 'rpm', float),
+    ('carry', 'yd', float),
+    ('total', 'yd', float),
+    ('hmt', None, flag),
+    ('club_speed', 'mph', float),
+    ('swing_path', 'deg', float),
+    ('angle_of_attack', 'deg', float),
+    ('face_to_target', 'deg', float),
+    ('lie', 'deg', float),
+    ('dynamic_loft', 'deg', float),
+    ('horizontal_impact_location', 'mm', float),
+    ('veritcal_impact_location', 'mm', float),
+    ('f_axis', 'deg', float),
+    ('closure_rate', 'deg/s', float),
+)
+
+FULL = 'full'
+BALL = 'ball'
+CLUB = 'club'
+
+FIELD_NAMES = tuple(name for name, _, _ in SHOT_FIELDS)
+FIELD_UNITS = {name: unit for name, unit, _ in SHOT_FIELDS}
+FIELD_CONVERTERS = {name: convert for name, _, convert in SHOT_FIELDS}
+
+
+class Shot:
+    __slots__ = FIELD_NAMES + ('transport', 'trace', 'raw', 'part', 'ball_shot', 'shot_number')
+
+    def __init__(self, transport=None, text=None, **values):
+        self.transport = transport
+        self.trace = None
+        self.raw = None
+        self.part = FULL
+        self.ball_shot = None
+        self.shot_number = None
+        if text is not None:
+            for name, value in text.items():
+                try:
+                    setattr(self, name, FIELD_CONVERTERS[name](value))
+                except ValueError:
+                    pass
+        for name, value in values.items():
+            setattr(self, name, value)
+
+    def __getattr__(self, name):
+        if name not in FIELD_CONVERTERS:
+            raise AttributeError(name)
+        return None
+
+    def as_dict(self):
+        output = {'transport': self.transport, 'part': self.part}
+        for name in FIELD_NAMES:
+            value = getattr(self, name)
+            if value is not None:
+                output[name] = value
+
+        return output
+
+    def __repr__(self):
+        values = []
+        for name in FIELD_NAMES:
+            value = getattr(self, name)
+            if value is not None:
+                unit = FIELD_UNITS[name]
+                values.append('%s=%s%s' % (name, value, ' ' + unit if unit else ''))
+
+        return 'Shot(%s, %s)' % (self.transport, ', '.join(values))
+
+
+class ClubFollowUp:
+
+    def __init__(self, key, timeout=5.0):
+        self.key = key
+        self.timeout = timeout
+        self.pending = None
+        self.sent = 0
+        self.expired = 0
+
+    def ball(self, shot, received_at):
+        if shot.club_speed is None:
+            shot.part = BALL
+            self.pending = (shot, received_at)
+        else:
+            self.pending = None
+
+    def club(self, shot, received_at):
+        if self.pending is None or shot.club_speed is None:
+            return None
+        ball, ball_received_at = self.pending
+        if getattr(shot, self.key) != getattr(ball, self.key):
+            return None
+        self.pending = None
+        if received_at - ball_received_at > self.timeout:
+            self.expired += 1
+            print('Club data for shot %s arrived after %.1f s, not sending it' % (ball.ID, received_at - ball_received_at))
+            return None
+        shot.part = CLUB
+        shot.ball_shot = ball
+        self.sent += 1
+        return shot
@@ -0,0 +1,185 @@
+import glob, mmap, os, queue, struct, threading, time
+from shot import FIELD_NAMES as SHOT_FIELD_NAMES
+
+
+SHOT_LOG_MAGIC = b'GC2LOG1\n'
+TEXT_FIELDS = ('serial_number', 'hardware_version', 'software_version')
+TEXT_LENGTH = 16
+RAW_LENGTH = 512
+TRANSPORT_CODES = {'bluetooth': 1, 'usb': 2}
+TRANSPORT_NAMES = {v: k for k, v in TRANSPORT_CODES.items()}
+DELIVERED = 1
+REJECTED = 2
+FAILED = 3
+OUTCOME_NAMES = {0: 'unknown', DELIVERED: 'delivered', REJECTED: 'rejected', FAILED: 'failed'}
+
+LAYOUT = [('timestamp', 'd', '<f8'), ('transport', 'B', 'u1'), ('outcome', 'B', 'u1')]
+for _name in SHOT_FIELD_NAMES:
+    if _name in TEXT_FIELDS:
+        LAYOUT.append((_name, '%ds' % TEXT_LENGTH, 'S%d' % TEXT_LENGTH))
+    else:
+        LAYOUT.append((_name, 'd', '<f8'))
+LAYOUT += [('raw_length', 'H', '<u2'), ('raw', '%ds' % RAW_LENGTH, 'S%d' % RAW_LENGTH)]
+RECORD = struct.Struct('<' + ''.join(code for _, code, _ in LAYOUT))
+FIELD_NAMES = tuple(name for name, _, _ in LAYOUT)
+HEADER = SHOT_LOG_MAGIC + struct.pack('<I', RECORD.size)
+
+
+def numpy_dtype():
+    import numpy as np
+    return np.dtype([(name, code) for name, _, code in LAYOUT])
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float('nan')
+
+
+def _text(value, length):
+    if value is None:
+        return b''
+    return str(value).encode('utf-8', 'replace')[:length]
+
+
+def pack_shot(shot, outcome=0, timestamp=None):
+    raw = _text(shot.raw, RAW_LENGTH)
+    values = [time.time() if timestamp is None else timestamp, TRANSPORT_CODES.get(shot.transport, 0), outcome]
+    for name in SHOT_FIELD_NAMES:
+        if name in TEXT_FIELDS:
+            values.append(_text(getattr(shot, name), TEXT_LENGTH))
+        else:
+            values.append(_number(getattr(shot, name)))
+
+    values += [len(raw), raw]
+    return RECORD.pack(*values)
+
+
+def unpack_shot(data, offset=0):
+    record = dict(zip(FIELD_NAMES, RECORD.unpack_from(data, offset)))
+    for name in TEXT_FIELDS:
+        record[name] = record[name].rstrip(b'\x00').decode('utf-8', 'replace')
+    record['raw'] = record['raw'][:record.pop('raw_length')].decode('utf-8', 'replace')
+    record['transport'] = TRANSPORT_NAMES.get(record['transport'], 'unknown')
+    record['outcome'] = OUTCOME_NAMES.get(record['outcome'], 'unknown')
+    return record
+
+
+class ShotLog:
+
+    def __init__(self, directory='shotlogs', prefix='shots', max_bytes=64 * 1024 * 1024, queue_size=1024):
+        self.directory = directory
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.written = 0
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._file = None
+        self._file_date = None
+        self._file_size = 0
+        self._thread = threading.Thread(target=(self.run), name='shotlog', daemon=True)
+        self._thread.start()
+
+    def append(self, shot, outcome=0):
+        try:
+            self._queue.put_nowait(pack_shot(shot, outcome))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def file_name(self, date):
+        index = 0
+        while True:
+            name = os.path.join(self.directory, '%s-%s-%03d.gc2log' % (self.prefix, date, index))
+            if not os.path.exists(name) or os.path.getsize(name) + RECORD.size <= self.max_bytes:
+                return name
+            index += 1
+
+    def _open(self, date):
+        if self._file is not None:
+            self._file.close()
+        os.makedirs(self.directory, exist_ok=True)
+        name = self.file_name(date)
+        self._file = open(name, 'ab')
+        if self._file.tell() == 0:
+            self._file.write(HEADER)
+        self._file_size = self._file.tell()
+        self._file_date = date
+
+    def _write(self, record):
+        date = time.strftime('%Y%m%d')
+        if self._file is None or date != self._file_date or self._file_size + len(record) > self.max_bytes:
+            self._open(date)
+        self._file.write(record)
+        self._file_size += len(record)
+        self.written += 1
+
+    def run(self):
+        while True:
+            record = self._queue.get()
+            if record is None:
+                break
+            try:
+                self._write(record)
+                if self._queue.empty():
+                    self._file.flush()
+            except OSError as e:
+                print('Could not write shot log: ' + str(e))
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def close(self, timeout=2.0):
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+
+class ShotLogReader:
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self._file = open(file_name, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._map = b''
+        if self._map[:len(SHOT_LOG_MAGIC)] != SHOT_LOG_MAGIC or struct.unpack_from('<I', self._map, len(SHOT_LOG_MAGIC))[0] != RECORD.size:
+            self.close()
+            raise ValueError('Not a compatible shot log: ' + file_name)
+        self.count = (len(self._map) - len(HEADER)) // RECORD.size
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        return unpack_shot(self._map, len(HEADER) + index * RECORD.size)
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self[i]
+
+    def records(self):
+        import numpy as np
+        return np.frombuffer(self._map, dtype=numpy_dtype(), count=self.count, offset=len(HEADER))
+
+    def close(self):
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def log_files(directory='shotlogs', prefix='shots'):
+    return sorted(glob.glob(os.path.join(directory, prefix + '-*.gc2log')))
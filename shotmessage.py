@@ -0,0 +1,84 @@
+import math
+
+
+BALL_FIELDS = (
+    ('Speed', 'ball_speed', '%.2f'),
+    ('SpinAxis', 'spin_axis', '%.2f'),
+    ('TotalSpin', 'total_spin', '%.1f'),
+    ('BackSpin', 'back_spin', '%.1f'),
+    ('SideSpin', 'side_spin', '%.1f'),
+    ('HLA', 'hla', '%.2f'),
+    ('VLA', 'vla', '%.2f'),
+)
+
+CLUB_FIELDS = (
+    ('Speed', 'club_speed', '%.2f'),
+    ('Path', 'path', '%.2f'),
+    ('FaceToTarget', 'face_to_target', '%.2f'),
+    ('AngleOfAttack', 'angle_of_attack', '%.2f'),
+    ('Loft', 'loft', '%.2f'),
+    ('Lie', 'lie', '%.2f'),
+    ('HorizontalFaceImpact', 'horizontal_face_impact', '%.2f'),
+    ('VerticalFaceImpact', 'vertical_face_impact', '%.2f'),
+    ('ClosureRate', 'closure_rate', '%.2f'),
+)
+
+_BALL_FORMATS = tuple(('"%s":%s' % (name, fmt), slot) for name, slot, fmt in BALL_FIELDS)
+_CLUB_FORMATS = tuple(('"%s":%s' % (name, fmt), slot) for name, slot, fmt in CLUB_FIELDS)
+_HEADER = '{"DeviceID":"%s","Units":"Yards","ShotNumber":%d,"APIversion":"1"'
+_OPTIONS = ',"ShotDataOptions":{"ContainsBallData":%s,"ContainsClubData":%s,"LaunchMonitorIsReady":%s,"LaunchMonitorBallDetected":%s,"IsHeartBeat":%s}}'
+_JSON_BOOL = {True: 'true', False: 'false'}
+
+
+class ShotMessage:
+    __slots__ = tuple(slot for _, slot, _ in BALL_FIELDS) + tuple(slot for _, slot, _ in CLUB_FIELDS)
+
+    def __init__(self, ball_speed=None, hla=None, vla=None, back_spin=None, side_spin=None, total_spin=None, spin_axis=None, **club):
+        self.ball_speed = ball_speed
+        self.hla = hla
+        self.vla = vla
+        self.back_spin = back_spin
+        self.side_spin = side_spin
+        self.total_spin = total_spin
+        self.spin_axis = spin_axis
+        for _, slot, _ in CLUB_FIELDS:
+            setattr(self, slot, club.pop(slot, None))
+
+        if club:
+            raise TypeError('Unknown club fields: ' + ', '.join(club))
+
+    @classmethod
+    def from_spin(cls, ball_speed, hla, vla, back_spin, side_spin, left_handed=False, **club):
+        total_spin = math.sqrt(side_spin ** 2 + back_spin ** 2)
+        spin_axis = math.degrees(math.atan2(side_spin, back_spin))
+        if left_handed:
+            spin_axis = -spin_axis
+        return cls(ball_speed, hla, vla, back_spin, side_spin, total_spin, spin_axis, **club)
+
+    def has_ball_data(self):
+        return self.ball_speed is not None
+
+    def has_club_data(self):
+        return self.club_speed is not None
+
+
+def _encode_fields(formats, shot):
+    parts = []
+    for fmt, slot in formats:
+        value = getattr(shot, slot)
+        if value is not None and math.isfinite(value):
+            parts.append(fmt % value)
+
+    return ','.join(parts)
+
+
+def encode_shot(shot, shot_number, device_id='gc2', ready=True, ball_detected=True, heartbeat=False):
+    has_ball = shot is not None and shot.has_ball_data()
+    has_club = shot is not None and shot.has_club_data()
+    message = _HEADER % (device_id, shot_number)
+    if has_ball:
+        message += ',"BallData":{' + _encode_fields(_BALL_FORMATS, shot) + '}'
+    if has_club:
+        message += ',"ClubData":{' + _encode_fields(_CLUB_FORMATS, shot) + '}'
+    message += _OPTIONS % (_JSON_BOOL[has_ball], _JSON_BOOL[has_club], _JSON_BOOL[bool(ready)], _JSON_BOOL[bool(ball_detected)], _JSON_BOOL[bool(heartbeat)])
+    return message.encode('utf-8')
@@ -0,0 +1,133 @@
+import threading, time
+import numpy as np
+
+
+COLUMNS = ('ball_speed', 'horizontal_launch_angle', 'launch_angle', 'total_spin', 'back_spin', 'side_spin', 'carry', 'total',
+           'club_speed', 'swing_path', 'angle_of_attack', 'face_to_target', 'dynamic_loft')
+CLUB_COLUMNS = ('club_speed', 'swing_path', 'angle_of_attack', 'face_to_target', 'dynamic_loft')
+STAT_COLUMNS = ('ball_speed', 'launch_angle', 'total_spin', 'back_spin', 'side_spin', 'horizontal_launch_angle', 'club_speed')
+COLUMN_INDEX = {name: i for i, name in enumerate(COLUMNS)}
+HANDS = ('right', 'left')
+
+
+class ShotStore:
+
+    def __init__(self, capacity=512):
+        self.size = 0
+        self.session = 0
+        self.clubs = []
+        self._club_codes = {}
+        self._values = np.full((len(COLUMNS), capacity), np.nan, dtype=np.float32)
+        self._times = np.zeros(capacity, dtype=np.float64)
+        self._club = np.zeros(capacity, dtype=np.int16)
+        self._hand = np.zeros(capacity, dtype=np.int8)
+        self._session = np.zeros(capacity, dtype=np.int32)
+        self._shot_number = np.full(capacity, -1, dtype=np.int64)
+        self._lock = threading.Lock()
+
+    def _grow(self):
+        capacity = self._times.shape[0] * 2
+        values = np.full((len(COLUMNS), capacity), np.nan, dtype=np.float32)
+        values[:, :self.size] = self._values[:, :self.size]
+        self._values = values
+        for name in ('_times', '_club', '_hand', '_session', '_shot_number'):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+    def club_code(self, club):
+        code = self._club_codes.get(club)
+        if code is None:
+            code = self._club_codes[club] = len(self.clubs)
+            self.clubs.append(club)
+        return code
+
+    def new_session(self):
+        with self._lock:
+            self.session += 1
+            return self.session
+
+    def append(self, shot, club='DR', hand='right', timestamp=None):
+        with self._lock:
+            if self.size == self._times.shape[0]:
+                self._grow()
+            i = self.size
+            for name, row in COLUMN_INDEX.items():
+                value = getattr(shot, name)
+                self._values[row, i] = np.nan if value is None else value
+
+            self._times[i] = time.time() if timestamp is None else timestamp
+            self._club[i] = self.club_code(club)
+            self._hand[i] = HANDS.index(hand) if hand in HANDS else 0
+            self._session[i] = self.session
+            self._shot_number[i] = -1 if shot.shot_number is None else shot.shot_number
+            self.size += 1
+
+    def merge_club(self, shot):
+        if shot.shot_number is None:
+            return False
+        with self._lock:
+            rows = np.flatnonzero(self._shot_number[:self.size] == shot.shot_number)
+            if rows.size == 0:
+                return False
+            i = rows[-1]
+            for name in CLUB_COLUMNS:
+                value = getattr(shot, name)
+                if value is not None:
+                    self._values[COLUMN_INDEX[name], i] = value
+
+            return True
+
+    def column(self, name):
+        with self._lock:
+            return self._values[COLUMN_INDEX[name], :self.size].copy()
+
+    def club_stats(self, session=None, columns=STAT_COLUMNS):
+        with self._lock:
+            n = self.size
+            rows = [COLUMN_INDEX[c] for c in columns]
+            values = self._values[rows, :n].astype(np.float64)
+            clubs = self._club[:n]
+            if session is not None:
+                mask = self._session[:n] == session
+                values = values[:, mask]
+                clubs = clubs[mask]
+            club_names = list(self.clubs)
+        if clubs.size == 0:
+            return {}
+        codes, inverse = np.unique(clubs, return_inverse=True)
+        valid = ~np.isnan(values)
+        filled = np.where(valid, values, 0.0)
+        groups = codes.size
+        offsets = (np.arange(len(columns)) * groups)[:, None]
+        index = (offsets + inverse[None, :]).ravel()
+        size = len(columns) * groups
+        counts = np.bincount(index, weights=valid.ravel(), minlength=size).reshape(len(columns), groups)
+        sums = np.bincount(index, weights=filled.ravel(), minlength=size).reshape(len(columns), groups)
+        squares = np.bincount(index, weights=(filled * filled).ravel(), minlength=size).reshape(len(columns), groups)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = sums / counts
+            stds = np.sqrt(np.maximum(squares / counts - means * means, 0.0))
+        shots = np.bincount(inverse, minlength=groups)
+        output = {}
+        for g, code in enumerate(codes):
+            stats = {'shots': int(shots[g])}
+            for c, name in enumerate(columns):
+                stats[name + '_mean'] = float(means[c, g])
+                stats[name + '_std'] = float(stds[c, g])
+            stats['dispersion'] = stats.get('horizontal_launch_angle_std', float('nan'))
+            output[club_names[code]] = stats
+
+        return output
+
+    def report(self, session=None):
+        lines = ['%-5s %5s %14s %14s %16s %12s' % ('club', 'shots', 'speed mph', 'launch deg', 'spin rpm', 'disp deg')]
+        for club, s in sorted(self.club_stats(session).items()):
+            lines.append('%-5s %5d %7.1f ±%5.1f %7.1f ±%5.1f %8.0f ±%6.0f %12.2f' % (club, s['shots'], s['ball_speed_mean'], s['ball_speed_std'], s['launch_angle_mean'], s['launch_angle_std'],
+                                                                            s['total_spin_mean'], s['total_spin_std'], s['dispersion']))
+
+        return '\n'.join(lines)
+
+    def nbytes(self):
+        return self._values.nbytes + self._times.nbytes + self._club.nbytes + self._hand.nbytes + self._session.nbytes + self._shot_number.nbytes
@@ -0,0 +1,175 @@
+import collections, configparser, importlib, json, os, socket, threading, time
+from endpoint import parse_endpoint
+from latency import percentile
+from pipeline import DROP_OLDEST, ShotPipeline
+
+
+DEFAULT_SINK_CONFIG = '''[Sink overlay]
+Enabled=false
+Type=udp
+Address=127.0.0.1:9210
+
+[Sink coaching]
+Enabled=false
+Type=tcp
+Address=127.0.0.1:9211
+
+[Sink export]
+Enabled=false
+Type=jsonl
+File=shots.jsonl
+'''
+
+
+def shot_json(shot):
+    message = shot.as_dict()
+    message['timestamp'] = time.time()
+    return (json.dumps(message, separators=(',', ':')) + '\n').encode('utf-8')
+
+
+class UdpSink:
+
+    def __init__(self, address='127.0.0.1:9210'):
+        self.address = parse_endpoint(address, 9210)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def __call__(self, shot):
+        self.sock.sendto(shot_json(shot), self.address)
+
+    def close(self):
+        self.sock.close()
+
+
+class TcpSink:
+
+    def __init__(self, address='127.0.0.1:9211', timeout='1.0'):
+        self.address = parse_endpoint(address, 9211)
+        self.timeout = float(timeout)
+        self.sock = None
+
+    def __call__(self, shot):
+        if self.sock is None:
+            self.sock = socket.create_connection(self.address, timeout=self.timeout)
+        try:
+            self.sock.sendall(shot_json(shot))
+        except OSError:
+            self.close()
+            raise
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+
+class JsonLinesSink:
+
+    def __init__(self, file='shots.jsonl'):
+        self.file = open(file, 'ab')
+
+    def __call__(self, shot):
+        self.file.write(shot_json(shot))
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+SINK_TYPES = {
+    'udp': UdpSink,
+    'tcp': TcpSink,
+    'jsonl': JsonLinesSink,
+}
+
+
+def sink_type(name):
+    if name in SINK_TYPES:
+        return SINK_TYPES[name]
+    module, _, attribute = name.partition(':')
+    if not attribute:
+        raise ValueError('Unknown sink type: ' + name)
+    return getattr(importlib.import_module(module), attribute)
+
+
+class SinkWorker:
+
+    def __init__(self, name, handler, maxsize=32, policy=DROP_OLDEST, window=1000):
+        self.name = name
+        self.handler = handler
+        self.pipeline = ShotPipeline(maxsize=maxsize, policy=policy, name=name, traced=False)
+        self.lags = collections.deque(maxlen=window)
+
+    def publish(self, shot):
+        return self.pipeline.submit(shot, self.deliver)
+
+    def deliver(self, shot):
+        try:
+            self.handler(shot)
+        finally:
+            if shot.trace is not None:
+                self.lags.append(time.monotonic() - shot.trace.stamps[0][1])
+
+    def stats(self):
+        stats = self.pipeline.stats()
+        lags = sorted(self.lags)
+        stats['delivered'] = stats['processed'] - stats['failed']
+        stats['lag_p50_ms'] = percentile(lags, 50) * 1000.0
+        stats['lag_p95_ms'] = percentile(lags, 95) * 1000.0
+        stats['lag_max_ms'] = lags[-1] * 1000.0 if lags else 0.0
+        return stats
+
+    def report(self):
+        return '%-12s ' % self.name + 'delivered %(delivered)5d dropped %(dropped)4d failed %(failed)4d depth %(depth)3d  lag p50 %(lag_p50_ms).1f ms p95 %(lag_p95_ms).1f ms max %(lag_max_ms).1f ms' % self.stats()
+
+    def stop(self):
+        self.pipeline.stop()
+        close = getattr(self.handler, 'close', None)
+        if close is not None:
+            close()
+
+
+class ShotFanOut:
+
+    def __init__(self):
+        self.sinks = []
+        self._lock = threading.Lock()
+
+    def add(self, name, handler, maxsize=32, policy=DROP_OLDEST):
+        worker = SinkWorker(name, handler, maxsize, policy)
+        with self._lock:
+            self.sinks = self.sinks + [worker]
+        return worker
+
+    def load_config(self, file_name='Sinks.txt'):
+        if not os.path.isfile(file_name):
+            with open(file_name, 'w', encoding="utf8", errors='ignore') as (config_file):
+                config_file.write(DEFAULT_SINK_CONFIG)
+        parser = configparser.ConfigParser()
+        parser.read(file_name, encoding='utf8')
+        for section in parser.sections():
+            if not section.startswith('Sink '):
+                continue
+            options = dict(parser[section])
+            if not parser[section].getboolean('Enabled', True):
+                continue
+            options.pop('enabled', None)
+            factory = sink_type(options.pop('type', '').strip())
+            maxsize = int(options.pop('queuesize', 32))
+            policy = options.pop('policy', DROP_OLDEST).strip()
+            try:
+                self.add(section[5:].strip(), factory(**options), maxsize=maxsize, policy=policy)
+            except (OSError, TypeError, ValueError) as e:
+                print('Could not start shot sink %s: %s' % (section[5:].strip(), e))
+
+        return self
+
+    def publish(self, shot):
+        for sink in self.sinks:
+            sink.publish(shot)
+
+    def stop(self):
+        for sink in self.sinks:
+            sink.stop()
+
+    def report(self):
+        return '\n'.join(['sinks:'] + ['  ' + sink.report() for sink in self.sinks])
@@ -0,0 +1,266 @@
+import configparser, os, threading, time
+
+
+SETTINGS = (
+    ('gspro_ip', 'GSProIP', str, 'localhost'),
+    ('gspro_port', 'GSProPort', int, 921),
+    ('wait_for_hmt', 'WaitForHMT', bool, False),
+    ('split_delivery', 'SplitDelivery', bool, False),
+    ('club_timeout', 'ClubTimeout', float, 5.0),
+    ('last_serial', 'LastSerial', str, ''),
+)
+DEVICE_FIELDS = (
+    ('address', 'Address', str, ''),
+    ('transport', 'Transport', str, 'bluetooth'),
+    ('last_connected', 'LastConnected', float, 0.0),
+    ('last_seen', 'LastSeen', float, 0.0),
+)
+
+
+def convert(kind, text):
+    if kind is bool:
+        try:
+            return configparser.ConfigParser.BOOLEAN_STATES[text.strip().lower()]
+        except KeyError:
+            raise ValueError('Not a boolean: ' + text)
+    return kind(text.strip())
+
+
+def format_value(value):
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
+
+
+class DeviceState:
+    __slots__ = ('serial',) + tuple(name for name, _, _, _ in DEVICE_FIELDS)
+
+    def __init__(self, serial, **values):
+        self.serial = serial
+        for name, _, _, default in DEVICE_FIELDS:
+            setattr(self, name, values.get(name, default))
+
+
+class StateStore:
+
+    def __init__(self, file_name='State.txt', legacy_config='Config.txt', legacy_device='lastgc2.txt', legacy_cache='gc2cache.txt'):
+        self.file_name = file_name
+        self.legacy_config = legacy_config
+        self.legacy_device = legacy_device
+        self.legacy_cache = legacy_cache
+        self.settings = {name: default for name, _, _, default in SETTINGS}
+        self.devices = {}
+        self.listeners = []
+        self.writes = 0
+        self.reloads = 0
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._stamp = None
+        self._dirty = threading.Event()
+        self._thread = None
+        self._watch_interval = None
+        if os.path.isfile(file_name):
+            self.load()
+        else:
+            self.import_legacy()
+            self.write()
+
+    def _file_stamp(self):
+        try:
+            stat = os.stat(self.file_name)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def load(self):
+        parser = configparser.ConfigParser()
+        parser.optionxform = str
+        stamp = self._file_stamp()
+        parser.read(self.file_name, encoding='utf8')
+        settings = {name: default for name, _, _, default in SETTINGS}
+        if parser.has_section('Settings'):
+            section = parser['Settings']
+            for name, key, kind, default in SETTINGS:
+                if key in section:
+                    try:
+                        settings[name] = convert(kind, section[key])
+                    except ValueError:
+                        print('Ignoring invalid %s in %s' % (key, self.file_name))
+
+        devices = {}
+        for section_name in parser.sections():
+            if section_name.startswith('Device '):
+                serial = section_name[7:].strip()
+                section = parser[section_name]
+                values = {}
+                for name, key, kind, default in DEVICE_FIELDS:
+                    if key in section:
+                        try:
+                            values[name] = convert(kind, section[key])
+                        except ValueError:
+                            pass
+
+                devices[serial] = DeviceState(serial, **values)
+
+        with self._lock:
+            self.settings = settings
+            self.devices = devices
+            self._stamp = stamp
+
+    def import_legacy(self):
+        try:
+            with open(self.legacy_config, 'r', encoding="utf8", errors='ignore') as (config_file):
+                for line in config_file:
+                    if line.startswith('IP='):
+                        self.settings['gspro_ip'] = line[3:].rstrip()
+
+        except FileNotFoundError:
+            pass
+        try:
+            with open(self.legacy_device, 'r', encoding="utf-8", errors='ignore') as (saved_gc2):
+                f = saved_gc2.read().splitlines()
+                if f and f[0] and f[0] != 'None':
+                    self.settings['last_serial'] = f[0]
+                    self.devices[f[0]] = DeviceState(f[0], address=(f[1] if len(f) > 1 else ''))
+        except FileNotFoundError:
+            pass
+        try:
+            with open(self.legacy_cache, 'r', encoding="utf8", errors='ignore') as (cache_file):
+                for line in cache_file:
+                    fields = line.rstrip('\n').split('\t')
+                    if len(fields) == 3:
+                        try:
+                            last_seen = float(fields[2])
+                        except ValueError:
+                            continue
+                        device = self.devices.get(fields[0])
+                        if device is None:
+                            device = self.devices[fields[0]] = DeviceState(fields[0])
+                        device.address = fields[1]
+                        device.last_seen = last_seen
+
+        except FileNotFoundError:
+            pass
+
+    def render(self):
+        parser = configparser.ConfigParser()
+        parser.optionxform = str
+        with self._lock:
+            parser['Settings'] = {key: format_value(self.settings[name]) for name, key, _, _ in SETTINGS}
+            for serial, device in sorted(self.devices.items()):
+                parser['Device ' + serial] = {key: format_value(getattr(device, name)) for name, key, _, _ in DEVICE_FIELDS}
+
+        return parser
+
+    def write(self):
+        temp_name = self.file_name + '.tmp'
+        with self._write_lock:
+            parser = self.render()
+            try:
+                with open(temp_name, 'w', encoding="utf8", errors='ignore') as (state_file):
+                    parser.write(state_file)
+                os.replace(temp_name, self.file_name)
+            except OSError as e:
+                print('Could not save %s: %s' % (self.file_name, e))
+                return False
+            with self._lock:
+                self._stamp = self._file_stamp()
+            self.writes += 1
+        return True
+
+    def save(self):
+        self._dirty.set()
+        self._start_thread()
+
+    def get(self, name):
+        with self._lock:
+            return self.settings[name]
+
+    def set(self, name, value):
+        with self._lock:
+            if self.settings[name] == value:
+                return
+            self.settings[name] = value
+        self.save()
+
+    def device(self, serial):
+        with self._lock:
+            return self.devices.get(str(serial))
+
+    def known_devices(self):
+        with self._lock:
+            return dict(self.devices)
+
+    def remember_device(self, serial, address=None, transport='bluetooth'):
+        serial = str(serial)
+        with self._lock:
+            device = self.devices.get(serial)
+            if device is None:
+                device = self.devices[serial] = DeviceState(serial)
+            if address:
+                device.address = address
+            device.transport = transport
+            device.last_connected = time.time()
+            self.settings['last_serial'] = serial
+        self.save()
+        return device
+
+    def device_seen(self, serial, address, now=None):
+        serial = str(serial)
+        with self._lock:
+            device = self.devices.get(serial)
+            if device is None:
+                device = self.devices[serial] = DeviceState(serial)
+            device.address = address
+            device.last_seen = time.time() if now is None else now
+        self.save()
+        return device
+
+    def reload_if_changed(self):
+        stamp = self._file_stamp()
+        with self._lock:
+            changed = stamp is not None and stamp != self._stamp
+        if not changed:
+            return False
+        self.load()
+        self.reloads += 1
+        for listener in self.listeners:
+            listener(self)
+        return True
+
+    def start_watching(self, interval=2.0, listener=None):
+        if listener is not None:
+            self.listeners.append(listener)
+        self._watch_interval = interval
+        self._start_thread()
+
+    def _start_thread(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=(self.run), name='state', daemon=True)
+                self._thread.start()
+
+    def run(self):
+        while True:
+            if self._dirty.wait(self._watch_interval or 1.0):
+                self._dirty.clear()
+                self.write()
+            elif self._watch_interval:
+                try:
+                    self.reload_if_changed()
+                except (OSError, configparser.Error) as e:
+                    print('Could not reload %s: %s' % (self.file_name, e))
+
+    def flush(self):
+        self._dirty.clear()
+        self.write()
+
+
+_store = None
+
+
+def default_store():
+    global _store
+    if _store is None:
+        _store = StateStore()
+    return _store
@@ -0,0 +1,33 @@
+import threading
+
+
+STOPPED = 'stopped'
+CONNECTING = 'connecting'
+CONNECTED = 'connected'
+SCANNING = 'scanning'
+
+
+class StatusPublisher:
+
+    def __init__(self, name):
+        self.name = name
+        self.state = STOPPED
+        self.events = None
+        self.notify = None
+        self._lock = threading.Lock()
+
+    def publish(self, state):
+        with self._lock:
+            if state == self.state:
+                return False
+            self.state = state
+            if self.events is not None:
+                self.events.put((self.name, state))
+        if self.notify is not None:
+            self.notify()
+        return True
+
+    def attach(self, events, notify=None):
+        self.events = events
+        self.notify = notify
+        events.put((self.name, self.state))
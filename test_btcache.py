@@ -0,0 +1,59 @@
+import threading
+from btcache import DiscoveryCache
+from state import StateStore
+
+
+def new_store(tmp_path):
+    return StateStore(str(tmp_path / 'State.txt'), legacy_config=str(tmp_path / 'Config.txt'), legacy_device=str(tmp_path / 'lastgc2.txt'),
+                      legacy_cache=str(tmp_path / 'gc2cache.txt'))
+
+
+def test_bays_share_device_entries(tmp_path):
+    store = new_store(tmp_path)
+    first = DiscoveryCache(store)
+    second = DiscoveryCache(store)
+    first.update('1111', '00:11:22:33:44:55')
+    second.update('2222', '66:77:88:99:AA:BB')
+    store.flush()
+    reloaded = DiscoveryCache(new_store(tmp_path))
+    assert reloaded.entries().keys() == {'1111', '2222'}
+    assert reloaded.lookup('1111') == '00:11:22:33:44:55'
+
+
+def test_concurrent_updates_are_all_saved(tmp_path):
+    store = new_store(tmp_path)
+    cache = DiscoveryCache(store)
+
+    def update(index):
+        for serial in range(index * 20, index * 20 + 20):
+            cache.update(str(serial), '00:00:00:00:00:%02X' % index)
+
+    threads = [threading.Thread(target=update, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    store.flush()
+    assert len(DiscoveryCache(new_store(tmp_path)).entries()) == 80
+
+
+def test_lookup_expires_old_entries(tmp_path):
+    cache = DiscoveryCache(new_store(tmp_path), ttl=60.0)
+    cache.update_from_scan([('00:11:22:33:44:55', 'Foresight_GC2 1234')], now=1000.0)
+    assert cache.lookup('1234', now=1030.0) == '00:11:22:33:44:55'
+    assert cache.lookup('1234', now=1100.0) is None
+
+
+def test_connected_address_reaches_the_device_entry(tmp_path):
+    store = new_store(tmp_path)
+    store.remember_device('1234')
+    DiscoveryCache(store).update('1234', '00:11:22:33:44:55')
+    store.flush()
+    assert new_store(tmp_path).device('1234').address == '00:11:22:33:44:55'
+
+
+def test_legacy_cache_is_imported(tmp_path):
+    (tmp_path / 'gc2cache.txt').write_text('1234\t00:11:22:33:44:55\t1000\n')
+    device = new_store(tmp_path).device('1234')
+    assert device.address == '00:11:22:33:44:55'
+    assert device.last_seen == 1000.0
@@ -0,0 +1,41 @@
+import configparser, random
+from filters import DEFAULT_FILTER_CONFIG, FilterEngine
+from shot import Shot
+
+
+def drive(rng, launch_angle=None, back_spin=None, ball_speed=150.0):
+    return Shot('bluetooth', ball_speed=ball_speed, launch_angle=(rng.gauss(12.0, 0.7) if launch_angle is None else launch_angle),
+                horizontal_launch_angle=0.0, back_spin=(rng.gauss(2600.0, 150.0) if back_spin is None else back_spin), side_spin=-200.0)
+
+
+def test_default_filters_keep_mishits():
+    rng = random.Random(1)
+    filters = FilterEngine.default()
+    for _ in range(30):
+        assert filters.check(drive(rng), 'DR') is None
+    assert filters.check(drive(rng, launch_angle=16.0), 'DR') is None
+    assert filters.check(drive(rng, launch_angle=3.0), 'DR') is None
+    assert filters.check(drive(rng, back_spin=3600.0), 'DR') is None
+
+
+def test_default_filters_reject_misreads():
+    rng = random.Random(1)
+    filters = FilterEngine.default()
+    assert filters.check(drive(rng, back_spin=2222.0), 'DR') == 'backspin_2222'
+    assert filters.check(drive(rng, ball_speed=0.0), 'DR') == 'no_ball_speed'
+    assert filters.check(drive(rng, ball_speed=400.0), 'DR') == 'implausible_ball_speed'
+    assert filters.check(drive(rng, back_spin=30000.0), 'DR') == 'implausible_spin'
+    assert filters.check(Shot('usb', ball_speed=31.0, launch_angle=2.1, back_spin=3500.0, side_spin=0.0), 'PW') == 'usb_3500_spin'
+    assert filters.check(Shot('bluetooth', ball_speed=31.0, launch_angle=2.1, back_spin=3500.0, side_spin=0.0), 'PW') is None
+
+
+def test_outliers_are_opt_in():
+    rng = random.Random(1)
+    parser = configparser.ConfigParser()
+    parser.read_string(DEFAULT_FILTER_CONFIG)
+    parser['Outliers']['Enabled'] = 'true'
+    filters = FilterEngine.from_parser(parser)
+    for _ in range(30):
+        assert filters.check(drive(rng), 'DR') is None
+    assert filters.check(drive(rng, back_spin=9000.0), 'DR') == 'outlier_spin_per_mph'
+    assert filters.check(drive(rng, launch_angle=16.0), 'DR') is None
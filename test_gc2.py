@@ -0,0 +1,122 @@
+import time
+from gc2 import GC2
+
+
+def test_background_refresh_scans_until_stopped():
+    gc2 = GC2()
+    scans = []
+    gc2.scan = lambda background=False: scans.append(background)
+    gc2.start_background_refresh(0.05)
+    time.sleep(0.5)
+    gc2.stop_background_refresh()
+    time.sleep(0.1)
+    count = len(scans)
+    time.sleep(0.2)
+    assert count >= 3
+    assert all(scans)
+    assert len(scans) == count
+
+
+def test_background_refresh_skips_while_connected():
+    gc2 = GC2()
+    scans = []
+    gc2.scan = lambda background=False: scans.append(background)
+    gc2.running = True
+    gc2.start_background_refresh(0.05)
+    time.sleep(0.3)
+    gc2.stop_background_refresh()
+    assert scans == []
+
+
+def test_parse_gc2_string():
+    shot = GC2.parse_gc2_string('CT=1262302,SN=2638,ID=3,TM=1262302,SP=142.71,AZ=2.14,EL=11.36,TS=2687,SS=-312,BS=2669,HMT=1,CS=101.20')
+    assert shot.transport == 'bluetooth'
+    assert shot.shot_time == 1262302.0
+    assert shot.ball_speed == 142.71
+    assert shot.side_spin == -312.0
+    assert shot.hmt is True
+    assert shot.club_speed == 101.2
+    assert shot.swing_path is None
+
+
+def test_parse_gc2_string_skips_lines_without_shot_time():
+    assert GC2.parse_gc2_string('CT=1259299,SN=2638,HW=3,SW=4.0.0') is None
+    assert GC2.parse_gc2_string('CT=1259299,TM=bad,SP=4.32').shot_time is None
+
+
+def test_parse_gc2_string_keeps_only_converted_fields():
+    shot = GC2.parse_gc2_string('CT=1262302,SN=2638,ID=3,TM=1262302,SP=fast,EL=11.36')
+    assert not hasattr(shot, 'text')
+    assert shot.ball_speed is None
+    assert shot.launch_angle == 11.36
+    assert shot.as_dict() == {'transport': 'bluetooth', 'part': 'full', 'current_time': 1262302.0, 'serial_number': '2638', 'ID': '3', 'shot_time': 1262302.0, 'launch_angle': 11.36}
+
+
+def test_status_drops_to_connecting_when_data_goes_stale(monkeypatch):
+    import gc2 as gc2_module
+    from status import CONNECTED, CONNECTING
+    monkeypatch.setattr(gc2_module, 'FRESH_DATA_SECONDS', 0.1)
+    gc2 = GC2()
+    gc2.running = True
+    gc2.data_received()
+    assert gc2.status.state == CONNECTED
+    time.sleep(0.05)
+    gc2.data_received()
+    time.sleep(0.1)
+    assert gc2.status.state == CONNECTED
+    time.sleep(0.2)
+    assert gc2.status.state == CONNECTING
+    assert gc2._freshness_timer is None
+
+
+class ScriptedSocket:
+
+    def __init__(self, gc2, script):
+        self.gc2 = gc2
+        self.script = list(script)
+
+    def connect(self, address):
+        pass
+
+    def settimeout(self, timeout):
+        pass
+
+    def recv(self, size):
+        while self.script:
+            step = self.script.pop(0)
+            if callable(step):
+                step()
+            else:
+                return step
+        self.gc2.running = False
+        return b''
+
+    def close(self):
+        pass
+
+
+def test_split_delivery_toggles_during_a_session():
+    gc2 = GC2()
+    gc2.wait_for_hmt = False
+    ball = b'CT=1,SN=2638,ID=1,TM=%d,SP=142.71,EL=11.36,BS=2669,SS=-312,HMT=0\n'
+    club = b'CT=1,SN=2638,ID=1,TM=%d,SP=142.71,EL=11.36,BS=2669,SS=-312,HMT=1,CS=101.20\n'
+
+    def split(value):
+        return lambda: setattr(gc2, 'split_delivery', value)
+
+    script = [ball % 1, ball % 2, split(True), ball % 3, club % 3, split(False), ball % 4, club % 4]
+    gc2.socket_factory = lambda protocol: ScriptedSocket(gc2, script)
+    shots = []
+    gc2.connect(shots.append, bt_addr='replay')
+    assert [(shot.shot_time, shot.part) for shot in shots] == [(2.0, 'full'), (3.0, 'ball'), (3.0, 'club'), (4.0, 'full')]
+    assert shots[2].ball_shot is shots[1]
+
+
+def test_club_timeout_reaches_the_live_follow_up():
+    gc2 = GC2()
+    gc2.split_delivery = True
+    gc2.club_timeout = 2.5
+    assert gc2.follow_up.timeout == 2.5
+    gc2.split_delivery = False
+    assert gc2.follow_up is None
+    assert gc2.club_timeout == 2.5
@@ -0,0 +1,12 @@
+from gc2USB import GC2USB
+
+
+def test_parse_gc2_usb_text():
+    shot = GC2USB.parse_gc2_usb_text('SHOT_ID=13\nSPEED_MPH=31.02\nELEVATION_DEG=2.10\nBACK_RPM=3500\nSIDE_RPM=0\nHMT=0\nCLUBSPEED_MPH=bad\n')
+    assert shot.transport == 'usb'
+    assert shot.ID == '13'
+    assert shot.ball_speed == 31.02
+    assert shot.back_spin == 3500.0
+    assert shot.hmt is False
+    assert shot.club_speed is None
+    assert shot.face_to_target is None
@@ -0,0 +1,43 @@
+from hub import read_hub_config
+
+
+def write_config(tmp_path, text):
+    file_name = tmp_path / 'Hub.txt'
+    file_name.write_text(text)
+    return str(file_name)
+
+
+def test_default_config_skips_bluetooth_bay_without_serial(tmp_path, capsys):
+    file_name = str(tmp_path / 'Hub.txt')
+    bays = read_hub_config(file_name)
+    assert [bay.name for bay in bays] == ['Bay 2']
+    assert bays[0].gspro_port == 922
+    assert 'Skipping Bay 1' in capsys.readouterr().out
+
+
+def test_bluetooth_bay_with_address_only(tmp_path):
+    bays = read_hub_config(write_config(tmp_path, '[Bay 1]\nTransport=Bluetooth\nAddress=00:11:22:33:44:55\nGSPro=10.0.0.5\nSplitDelivery=yes\n'))
+    assert len(bays) == 1
+    assert bays[0].transport == 'bluetooth'
+    assert bays[0].serial is None
+    assert bays[0].address == '00:11:22:33:44:55'
+    assert bays[0].gspro_host == '10.0.0.5'
+    assert bays[0].split_delivery
+
+
+def test_unknown_transport_is_skipped(tmp_path, capsys):
+    assert read_hub_config(write_config(tmp_path, '[Bay 1]\nTransport=serial\n')) == []
+    assert 'unknown transport' in capsys.readouterr().out
+
+
+def test_warns_when_several_usb_bays_have_no_location(tmp_path, capsys):
+    bays = read_hub_config(write_config(tmp_path, '[Bay 1]\nTransport=usb\n\n[Bay 2]\nTransport=usb\n\n[Bay 3]\nTransport=usb\nLocation=1-2.3\n'))
+    assert len(bays) == 3
+    out = capsys.readouterr().out
+    assert 'Bay 1, Bay 2 have no Location' in out
+    assert 'Bay 3' not in out
+
+
+def test_single_usb_bay_without_location_is_fine(tmp_path, capsys):
+    assert len(read_hub_config(write_config(tmp_path, '[Bay 1]\nTransport=usb\n'))) == 1
+    assert capsys.readouterr().out == ''
@@ -0,0 +1,181 @@
+import json, socket, threading, time
+from framing import JsonFramer
+from gspro_standin import StandInServer
+from OpenAPI import OpenAPI
+
+
+class SilentServer:
+
+    def __init__(self, answer_shots=False):
+        self.answer_shots = answer_shots
+        self.connections = 0
+        self.shots = 0
+        self.listener = socket.socket()
+        self.listener.bind(('127.0.0.1', 0))
+        self.listener.listen(5)
+        self.port = self.listener.getsockname()[1]
+        threading.Thread(target=(self.run), daemon=True).start()
+
+    def run(self):
+        while True:
+            try:
+                client, _ = self.listener.accept()
+            except OSError:
+                return
+            self.connections += 1
+            threading.Thread(target=(self.serve), args=(client,), daemon=True).start()
+
+    def serve(self, client):
+        time.sleep(0.1)
+        player_info = {'Code': 201, 'Message': 'GSPro Player Information', 'data': {'club_small': 'DR', 'distance_to_flag': 400.0, 'handed_player': 'right'}}
+        framer = JsonFramer()
+        try:
+            client.sendall(json.dumps(player_info).encode('utf-8'))
+            while True:
+                data = client.recv(4096)
+                if not data:
+                    break
+                for text in framer.feed(data):
+                    if self.answer_shots and not json.loads(text)['ShotDataOptions'].get('IsHeartBeat'):
+                        self.shots += 1
+                        client.sendall(json.dumps({'Code': 200, 'Message': 'Shot received successfully'}).encode('utf-8'))
+                        client.sendall(json.dumps(player_info).encode('utf-8'))
+        except OSError:
+            pass
+        client.close()
+
+    def stop(self):
+        self.listener.close()
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_player_info_is_not_a_heartbeat_ack():
+    server = SilentServer()
+    gspro = OpenAPI(server_ip='127.0.0.1', server_port=server.port, heartbeat_interval=0.05, liveness_timeout=0.2)
+    try:
+        assert wait_for(gspro.is_connected)
+        time.sleep(1.0)
+        assert server.connections == 1
+        assert not gspro.heartbeat_acknowledged
+    finally:
+        gspro.disconnect()
+        server.stop()
+
+
+def test_shot_replies_are_not_heartbeat_acks():
+    from shotmessage import ShotMessage
+    server = SilentServer(answer_shots=True)
+    gspro = OpenAPI(server_ip='127.0.0.1', server_port=server.port, heartbeat_interval=0.01, liveness_timeout=0.3)
+    gspro.echo_shots = False
+    results = []
+    try:
+        assert wait_for(gspro.is_connected)
+        time.sleep(1.0)
+        for _ in range(5):
+            gspro.send_shot(ShotMessage.from_spin(142.7, 2.1, 11.4, 2669.0, -312.0), done=results.append)
+        assert wait_for(lambda: len(results) == 5)
+        time.sleep(1.0)
+        assert server.shots == 5
+        assert server.connections == 1
+        assert not gspro.heartbeat_acknowledged
+        assert gspro.heartbeat_ignored
+    finally:
+        gspro.disconnect()
+        server.stop()
+
+
+def test_heartbeat_reply_is_an_ack():
+    server = StandInServer(port=0)
+    gspro = OpenAPI(server_ip='127.0.0.1', server_port=server.start(), heartbeat_interval=0.05)
+    try:
+        assert wait_for(lambda: gspro.heartbeat_acknowledged)
+        assert server.connections == 1
+    finally:
+        gspro.disconnect()
+        server.stop()
+
+
+def test_shot_numbers_are_unique_across_threads():
+    from shotmessage import ShotMessage
+    server = StandInServer(port=0)
+    gspro = OpenAPI(server_ip='127.0.0.1', server_port=server.start(), heartbeat_interval=60.0)
+    gspro.echo_shots = False
+    numbers = []
+
+    def send():
+        for _ in range(25):
+            numbers.append(gspro.send_shot(ShotMessage.from_spin(142.7, 2.1, 11.4, 2669.0, -312.0)))
+
+    try:
+        assert wait_for(gspro.is_connected)
+        threads = [threading.Thread(target=send) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert sorted(numbers) == list(range(1, 101))
+        assert wait_for(lambda: len(server.received) == 101)
+        sent = [m['ShotNumber'] for _, m in server.received if not m['ShotDataOptions'].get('IsHeartBeat')]
+        assert sorted(sent) == list(range(1, 101))
+    finally:
+        gspro.disconnect()
+        server.stop()
+
+
+def test_shot_age_counts_from_device_read():
+    from latency import ShotTrace
+    from shotmessage import ShotMessage
+    probe = socket.socket()
+    probe.bind(('127.0.0.1', 0))
+    port = probe.getsockname()[1]
+    probe.close()
+    gspro = OpenAPI(server_ip='127.0.0.1', server_port=port, heartbeat_interval=60.0, max_shot_age=1.5)
+    gspro.echo_shots = False
+    results = []
+    server = StandInServer(port=port)
+    try:
+        start = time.monotonic()
+        for i in range(3):
+            number = gspro.send_shot(ShotMessage.from_spin(142.7, 2.1, 11.4, 2669.0, -312.0), trace=ShotTrace('bluetooth', start - 1.0),
+                                     done=lambda sent, i=i: results.append((i, sent)))
+            assert number == i + 1
+        assert time.monotonic() - start < 0.1
+        time.sleep(0.5)
+        gspro.send_shot(ShotMessage.from_spin(142.7, 2.1, 11.4, 2669.0, -312.0), trace=ShotTrace('bluetooth'), done=lambda sent: results.append((3, sent)))
+        time.sleep(0.1)
+        server.start()
+        assert wait_for(lambda: len(results) == 4, timeout=4.0)
+        assert results == [(0, False), (1, False), (2, False), (3, True)]
+        assert gspro.outbound_expired == 3
+        assert [m['ShotNumber'] for _, m in server.received if not m['ShotDataOptions'].get('IsHeartBeat')] == [4]
+    finally:
+        gspro.disconnect()
+        server.stop()
+
+
+def test_unanswered_shots_are_resent_after_a_reconnect():
+    from shotmessage import ShotMessage
+    server = StandInServer(port=0, disconnect_after=3)
+    gspro = OpenAPI(server_ip='127.0.0.1', server_port=server.start(), heartbeat_interval=60.0)
+    gspro.echo_shots = False
+    results = []
+    try:
+        assert wait_for(gspro.is_connected)
+        for _ in range(8):
+            gspro.send_shot(ShotMessage.from_spin(142.7, 2.1, 11.4, 2669.0, -312.0), done=results.append)
+        assert wait_for(lambda: len(results) == 8, timeout=8.0)
+        assert results == [True] * 8
+        shots = {m['ShotNumber'] for _, m in server.received if not m['ShotDataOptions'].get('IsHeartBeat')}
+        assert shots == set(range(1, 9))
+        assert server.connections >= 3
+    finally:
+        gspro.disconnect()
+        server.stop()
@@ -0,0 +1,42 @@
+import threading, time
+from pipeline import ShotPipeline
+
+
+class Item:
+    trace = None
+
+    def __init__(self, key, number):
+        self.key = key
+        self.number = number
+
+
+def test_keyed_shots_stay_in_order():
+    pipeline = ShotPipeline(maxsize=64, workers=2, traced=False)
+    handled = {0: [], 1: []}
+    lock = threading.Lock()
+
+    def handler(item):
+        if item.number % 3 == 0:
+            time.sleep(0.01)
+        with lock:
+            handled[item.key].append(item.number)
+
+    for number in range(20):
+        for key in (0, 1):
+            pipeline.submit(Item(key, number), handler, key=key)
+    pipeline.stop()
+    assert handled[0] == list(range(20))
+    assert handled[1] == list(range(20))
+
+
+def test_slow_key_does_not_hold_up_others():
+    pipeline = ShotPipeline(maxsize=8, workers=2, traced=False)
+    release = threading.Event()
+    done = threading.Event()
+    pipeline.submit(Item(0, 0), lambda item: release.wait(2.0), key=0)
+    pipeline.submit(Item(1, 0), lambda item: done.set(), key=1)
+    try:
+        assert done.wait(1.0)
+    finally:
+        release.set()
+        pipeline.stop()
@@ -0,0 +1,46 @@
+import math
+from shot import BALL, CLUB, Shot
+from shotstore import ShotStore
+
+
+def ball_shot(shot_number, ball_speed=140.0):
+    shot = Shot('bluetooth', ball_speed=ball_speed, launch_angle=12.0, total_spin=2700.0, horizontal_launch_angle=1.0)
+    shot.part = BALL
+    shot.shot_number = shot_number
+    return shot
+
+
+def test_club_follow_up_fills_the_ball_row():
+    store = ShotStore(capacity=2)
+    store.append(ball_shot(1))
+    store.append(ball_shot(2))
+    club = Shot('bluetooth', ball_speed=140.0, club_speed=101.2, swing_path=3.1, dynamic_loft=14.2)
+    club.part = CLUB
+    club.shot_number = 1
+    assert store.merge_club(club)
+    assert store.size == 2
+    assert list(store.column('club_speed')[:1]) == [101.19999694824219]
+    assert math.isnan(store.column('club_speed')[1])
+    assert store.club_stats()['DR']['club_speed_mean'] == 101.19999694824219
+
+
+def test_club_follow_up_without_ball_row_is_dropped():
+    store = ShotStore()
+    store.append(ball_shot(1))
+    club = Shot('usb', club_speed=101.2)
+    club.shot_number = 7
+    assert not store.merge_club(club)
+    club.shot_number = None
+    assert not store.merge_club(club)
+    assert math.isnan(store.column('club_speed')[0])
+
+
+def test_stats_per_session():
+    store = ShotStore()
+    store.append(ball_shot(1, 100.0))
+    assert store.new_session() == 1
+    store.append(ball_shot(2, 150.0))
+    store.append(ball_shot(3, 160.0))
+    assert store.club_stats(0)['DR']['shots'] == 1
+    assert store.club_stats(1)['DR']['ball_speed_mean'] == 155.0
+    assert store.club_stats()['DR']['shots'] == 3